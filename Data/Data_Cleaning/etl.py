@@ -0,0 +1,82 @@
+# etl.py - reshape the wide Google Trends export into the loader's long format
+#
+# Replaces the per-year health_data(year) cells of Health_Analysis.ipynb with a
+# single vectorized unpivot of every "YYYY+condition" column, so new years or
+# conditions need no code changes.
+#
+# Usage:
+#   python etl.py [--input RAW_CSV] [--output SEARCH_CONDITION_CSV]
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_CSV = os.path.join(BASE_DIR, 'raw_data', 'RegionalInterestByConditionOverTime.csv')
+LOADER_CSV = os.path.join(BASE_DIR, '..', 'database', 'load_in_to_db', 'search_condition.csv')
+
+# Raw condition names -> search_condition column names
+CONDITION_COLUMNS = {
+    'cancer': 'Cancer',
+    'cardiovascular': 'cardiovascular',
+    'stroke': 'stroke',
+    'depression': 'depression',
+    'rehab': 'rehab',
+    'vaccine': 'vaccine',
+    'diarrhea': 'diarrhea',
+    'obesity': 'obesity',
+    'diabetes': 'diabetes'
+}
+
+TREND_COLUMN = r'^(\d{4})\+(\w+)$'
+
+
+def read_trends(path=RAW_CSV):
+    """Read the wide export: one row per DMA, one column per year and condition"""
+    return pd.read_csv(path, encoding='utf-8-sig')
+
+
+def unpivot(wide):
+    """Turn "YYYY+condition" columns into one row per (location_id, year)"""
+    parts = wide.columns.str.extract(TREND_COLUMN)
+    is_trend = parts[0].notna().to_numpy()
+
+    values = wide.loc[:, is_trend]
+    values.index = pd.MultiIndex.from_arrays([wide['geoCode'], wide['dma']],
+                                             names=['location_id', 'dma'])
+    values.columns = pd.MultiIndex.from_arrays([parts.loc[is_trend, 0].astype(int),
+                                                parts.loc[is_trend, 1]],
+                                               names=['year', 'condition'])
+
+    long = values.stack('year', future_stack=True).reset_index()
+    long = long.sort_values(['year', 'dma'], kind='mergesort').drop(columns='dma')
+    long = long.rename(columns=CONDITION_COLUMNS)
+
+    conditions = [c for c in CONDITION_COLUMNS.values() if c in long.columns]
+    conditions += [c for c in long.columns if c not in conditions + ['location_id', 'year']]
+    long = long[['location_id'] + conditions + ['year']]
+
+    for column in long.columns:
+        long[column] = pd.to_numeric(long[column], downcast='integer')
+    return long.reset_index(drop=True)
+
+
+def write_loader_csv(long, path=LOADER_CSV):
+    """Write the table in the column layout load_data.py expects"""
+    long.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Unpivot the Google Trends export for load_data.py')
+    parser.add_argument('--input', default=RAW_CSV, help='wide RegionalInterestByConditionOverTime.csv')
+    parser.add_argument('--output', default=LOADER_CSV, help='long search_condition.csv to write')
+    args = parser.parse_args(argv)
+
+    long = unpivot(read_trends(args.input))
+    write_loader_csv(long, args.output)
+    print(f"Wrote {len(long)} rows ({long['year'].nunique()} years) to {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
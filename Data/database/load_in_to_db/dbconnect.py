@@ -0,0 +1,19 @@
+# dbconnect.py - shared database connection for the load_in_to_db scripts
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+
+def get_engine():
+    """Create an engine from DATABASE_URL, the same way app.py does"""
+    load_dotenv()
+    database_url = os.environ.get("DATABASE_URL")
+
+    if not database_url:
+        raise RuntimeError("DATABASE_URL environment variable not set")
+
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    return create_engine(database_url)
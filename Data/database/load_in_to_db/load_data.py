@@ -0,0 +1,156 @@
+# load_data.py - bulk load the cleaned CSVs into health_db with COPY
+#
+# Replaces the to_sql cells of loadData.ipynb. Every run happens in one
+# transaction: changed files are streamed into temporary staging tables with
+# COPY FROM STDIN, swapped into the live tables, the rollups are rebuilt and
+# dataset_version is bumped. The rewritten tables are vacuumed after commit.
+# Files whose checksum matches the last load are skipped, so rerunning the
+# loader is a no-op.
+#
+# Usage:
+#   python load_data.py [--data-dir DIR] [--force]
+import argparse
+import csv
+import hashlib
+import os
+import sys
+
+from sqlalchemy import text
+
+from dbconnect import get_engine
+from refresh_rollups import ROLLUPS, refresh_rollups
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Load order matters: search_condition references location
+TABLES = [
+    ('location', 'location.csv'),
+    ('search_condition', 'search_condition.csv'),
+    ('leading_causes_of_death', 'leading_causes_of_death.csv')
+]
+
+# Reloading a table forces a reload of the tables that reference it
+DEPENDENTS = {
+    'location': ['search_condition']
+}
+
+CREATE_CHECKSUMS_TABLE = """
+CREATE TABLE IF NOT EXISTS load_checksums (
+    "table_name" VARCHAR PRIMARY KEY,
+    "checksum" VARCHAR NOT NULL,
+    "loaded_at" TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def csv_columns(path):
+    """Header row of a CSV, without the byte order mark some exports carry"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f))
+
+
+def tables_to_load(conn, checksums, force=False):
+    """Tables whose CSV changed since the last load, plus their dependents"""
+    conn.execute(text(CREATE_CHECKSUMS_TABLE))
+    stored = dict(conn.execute(text('SELECT table_name, checksum FROM load_checksums')).fetchall())
+
+    changed = {table for table, _ in TABLES if force or stored.get(table) != checksums[table]}
+    for table in list(changed):
+        changed.update(DEPENDENTS.get(table, []))
+    return [table for table, _ in TABLES if table in changed]
+
+
+def copy_into_staging(conn, table, path):
+    """Stream a CSV into a temporary copy of the table; returns the row count"""
+    staging = f'staging_{table}'
+    columns = ', '.join(f'"{c}"' for c in csv_columns(path))
+
+    conn.execute(text(f'CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP'))
+    cursor = conn.connection.cursor()
+    try:
+        with open(path, 'rb') as f:
+            cursor.copy_expert(f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)',
+                               f, size=CHUNK_SIZE)
+    finally:
+        cursor.close()
+    return conn.execute(text(f'SELECT COUNT(*) FROM {staging}')).scalar()
+
+
+def swap_in(conn, tables):
+    """Replace live rows with the staged ones; invisible to readers until commit"""
+    # Children first on delete, parents first on insert, to satisfy the foreign key
+    for table in reversed(tables):
+        conn.execute(text(f'DELETE FROM {table}'))
+    for table in tables:
+        conn.execute(text(f'INSERT INTO {table} SELECT * FROM staging_{table}'))
+        conn.execute(text(f'ANALYZE {table}'))
+
+
+def vacuum(engine, tables):
+    """Reclaim the rows the swap deleted and refresh planner statistics
+
+    DELETE keeps readers on the old rows until commit, where TRUNCATE would
+    block them, but leaves every old row behind as a dead tuple. VACUUM
+    cannot run inside a transaction, so this runs once the load has committed.
+    """
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for table in tables:
+            conn.execute(text(f'VACUUM (ANALYZE) {table}'))
+
+
+def load(engine, data_dir=DATA_DIR, force=False):
+    paths = {table: os.path.join(data_dir, filename) for table, filename in TABLES}
+    checksums = {table: file_checksum(path) for table, path in paths.items()}
+
+    with engine.begin() as conn:
+        tables = tables_to_load(conn, checksums, force)
+        if not tables:
+            print("All files unchanged since the last load, nothing to do")
+            return
+
+        for table in tables:
+            rows = copy_into_staging(conn, table, paths[table])
+            print(f"Staged {table}: {rows} rows")
+
+        swap_in(conn, tables)
+        refresh_rollups(conn)
+
+        for table in tables:
+            conn.execute(text('DELETE FROM load_checksums WHERE table_name = :table'), {'table': table})
+            conn.execute(text('INSERT INTO load_checksums (table_name, checksum) VALUES (:table, :checksum)'),
+                         {'table': table, 'checksum': checksums[table]})
+
+        version = conn.execute(text(
+            'INSERT INTO dataset_version (version) '
+            'SELECT COALESCE(MAX(version), 0) + 1 FROM dataset_version '
+            'RETURNING version')).scalar()
+
+    vacuum(engine, tables + list(ROLLUPS))
+    print(f"Loaded {', '.join(tables)} as dataset version {version}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk load the health CSVs into PostgreSQL')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='directory holding location.csv, search_condition.csv '
+                             'and leading_causes_of_death.csv')
+    parser.add_argument('--force', action='store_true',
+                        help='reload every table even if its file is unchanged')
+    args = parser.parse_args(argv)
+
+    load(get_engine(), args.data_dir, args.force)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
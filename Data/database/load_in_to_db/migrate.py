@@ -0,0 +1,93 @@
+# migrate.py - apply versioned SQL migrations to an existing health_db
+#
+# Usage:
+#   python migrate.py status
+#   python migrate.py upgrade [--to VERSION]
+import argparse
+import os
+import re
+import sys
+
+from sqlalchemy import text
+
+from dbconnect import get_engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    "version" INTEGER PRIMARY KEY,
+    "name" VARCHAR NOT NULL,
+    "applied_at" TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+
+def available_migrations():
+    """Return [(version, name, path)] for every migration file, oldest first"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2),
+                               os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+
+def applied_versions(conn):
+    """Versions already recorded in schema_migrations"""
+    conn.execute(text(CREATE_MIGRATIONS_TABLE))
+    rows = conn.execute(text('SELECT version FROM schema_migrations'))
+    return {row[0] for row in rows}
+
+
+def status(engine):
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+    for version, name, _ in available_migrations():
+        state = 'applied' if version in applied else 'pending'
+        print(f"{version:04d} {name:<40} {state}")
+
+
+def upgrade(engine, target=None):
+    """Apply each pending migration in its own transaction"""
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+
+    pending = [m for m in available_migrations()
+               if m[0] not in applied and (target is None or m[0] <= target)]
+    if not pending:
+        print("Database is up to date")
+        return
+
+    for version, name, path in pending:
+        with open(path) as f:
+            sql = f.read()
+        print(f"Applying {version:04d} {name} ...")
+        # PostgreSQL DDL is transactional, so a failing migration leaves no trace
+        with engine.begin() as conn:
+            conn.exec_driver_sql(sql)
+            conn.execute(text('INSERT INTO schema_migrations (version, name) VALUES (:version, :name)'),
+                         {'version': version, 'name': name})
+    print(f"Applied {len(pending)} migration(s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage health_db schema migrations')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help='list applied and pending migrations')
+    upgrade_parser = commands.add_parser('upgrade', help='apply pending migrations')
+    upgrade_parser.add_argument('--to', type=int, default=None,
+                                help='stop after this migration version')
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    if args.command == 'status':
+        status(engine)
+    else:
+        upgrade(engine, args.to)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+-- 0001: typed columns, keys and indexes for the all-VARCHAR tables
+-- Casts go through ::text so this works whether the columns were created by
+-- schema.sql (VARCHAR) or by DataFrame.to_sql (bigint / double precision).
+
+-- Drop duplicate rows left behind by repeated to_sql(if_exists='append') loads
+DELETE FROM location a
+USING location b
+WHERE a.ctid > b.ctid AND a.location_id = b.location_id;
+
+DELETE FROM search_condition a
+USING search_condition b
+WHERE a.ctid > b.ctid AND a.location_id = b.location_id AND a.year = b.year;
+
+ALTER TABLE location
+    ALTER COLUMN location_id TYPE INTEGER USING location_id::text::numeric::integer,
+    ALTER COLUMN latitude TYPE DOUBLE PRECISION USING NULLIF(latitude::text, '')::double precision,
+    ALTER COLUMN longitude TYPE DOUBLE PRECISION USING NULLIF(longitude::text, '')::double precision;
+
+ALTER TABLE location ADD CONSTRAINT location_pkey PRIMARY KEY (location_id);
+
+ALTER TABLE search_condition
+    ALTER COLUMN location_id TYPE INTEGER USING location_id::text::numeric::integer,
+    ALTER COLUMN "Cancer" TYPE SMALLINT USING NULLIF("Cancer"::text, '')::numeric::smallint,
+    ALTER COLUMN "cardiovascular" TYPE SMALLINT USING NULLIF("cardiovascular"::text, '')::numeric::smallint,
+    ALTER COLUMN "stroke" TYPE SMALLINT USING NULLIF("stroke"::text, '')::numeric::smallint,
+    ALTER COLUMN "depression" TYPE SMALLINT USING NULLIF("depression"::text, '')::numeric::smallint,
+    ALTER COLUMN "rehab" TYPE SMALLINT USING NULLIF("rehab"::text, '')::numeric::smallint,
+    ALTER COLUMN "vaccine" TYPE SMALLINT USING NULLIF("vaccine"::text, '')::numeric::smallint,
+    ALTER COLUMN "diarrhea" TYPE SMALLINT USING NULLIF("diarrhea"::text, '')::numeric::smallint,
+    ALTER COLUMN "obesity" TYPE SMALLINT USING NULLIF("obesity"::text, '')::numeric::smallint,
+    ALTER COLUMN "diabetes" TYPE SMALLINT USING NULLIF("diabetes"::text, '')::numeric::smallint,
+    ALTER COLUMN year TYPE INTEGER USING year::text::numeric::integer,
+    ALTER COLUMN year SET NOT NULL;
+
+ALTER TABLE search_condition
+    ADD CONSTRAINT search_condition_location_id_fkey
+    FOREIGN KEY (location_id) REFERENCES location (location_id);
+
+CREATE INDEX search_condition_year_idx ON search_condition (year);
+CREATE UNIQUE INDEX search_condition_location_year_idx ON search_condition (location_id, year);
+
+ALTER TABLE leading_causes_of_death
+    ALTER COLUMN "Diseases_of_heart" TYPE REAL USING NULLIF("Diseases_of_heart"::text, '')::real,
+    ALTER COLUMN "Malignant_neoplasms" TYPE REAL USING NULLIF("Malignant_neoplasms"::text, '')::real,
+    ALTER COLUMN "Accidents" TYPE REAL USING NULLIF("Accidents"::text, '')::real,
+    ALTER COLUMN "Respiratory" TYPE REAL USING NULLIF("Respiratory"::text, '')::real,
+    ALTER COLUMN "Cerebrovascular" TYPE REAL USING NULLIF("Cerebrovascular"::text, '')::real,
+    ALTER COLUMN "Alzheimer" TYPE REAL USING NULLIF("Alzheimer"::text, '')::real,
+    ALTER COLUMN "Diabetes" TYPE REAL USING NULLIF("Diabetes"::text, '')::real,
+    ALTER COLUMN "Influenza_and_pneumonia" TYPE REAL USING NULLIF("Influenza_and_pneumonia"::text, '')::real,
+    ALTER COLUMN "Nephrosis" TYPE REAL USING NULLIF("Nephrosis"::text, '')::real,
+    ALTER COLUMN "Suicide" TYPE REAL USING NULLIF("Suicide"::text, '')::real,
+    ALTER COLUMN year TYPE INTEGER USING year::text::numeric::integer;
+
+-- Older deployments predate the dataset version table
+CREATE TABLE IF NOT EXISTS dataset_version (
+    "version" INTEGER NOT NULL,
+    "loaded_at" TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- Column types changed, so cached payloads and worker snapshots are stale
+INSERT INTO dataset_version ("version")
+SELECT COALESCE(MAX("version"), 0) + 1 FROM dataset_version;
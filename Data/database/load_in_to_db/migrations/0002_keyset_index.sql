@@ -0,0 +1,5 @@
+-- 0002: index matching the (year, location_id) keyset order of the paginated routes
+-- It also serves every lookup the plain (year) index did, so that one is dropped.
+CREATE INDEX IF NOT EXISTS search_condition_year_location_idx ON search_condition (year, location_id);
+
+DROP INDEX IF EXISTS search_condition_year_idx;
@@ -0,0 +1,172 @@
+-- 0003: summary tables read by the aggregate routes and chatbot helpers
+-- Same DDL as refresh_rollups.py, which rebuilds them after every load; they
+-- are filled here too so the routes have data before the next refresh.
+
+CREATE TABLE IF NOT EXISTS rollup_year (
+    "year" INTEGER,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+DELETE FROM rollup_year;
+
+INSERT INTO rollup_year (year, cancer, cardiovascular, stroke, depression, rehab, vaccine, diarrhea, obesity, diabetes, searches)
+SELECT s.year,
+    SUM(s."Cancer"),
+    SUM(s."cardiovascular"),
+    SUM(s."stroke"),
+    SUM(s."depression"),
+    SUM(s."rehab"),
+    SUM(s."vaccine"),
+    SUM(s."diarrhea"),
+    SUM(s."obesity"),
+    SUM(s."diabetes"),
+    SUM(s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes")
+FROM search_condition s
+GROUP BY s.year;
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    "state" VARCHAR,
+    "postal" VARCHAR,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+DELETE FROM rollup_state;
+
+INSERT INTO rollup_state (state, postal, cancer, cardiovascular, stroke, depression, rehab, vaccine, diarrhea, obesity, diabetes, searches)
+SELECT l.state, l.postal,
+    SUM(s."Cancer"),
+    SUM(s."cardiovascular"),
+    SUM(s."stroke"),
+    SUM(s."depression"),
+    SUM(s."rehab"),
+    SUM(s."vaccine"),
+    SUM(s."diarrhea"),
+    SUM(s."obesity"),
+    SUM(s."diabetes"),
+    SUM(s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes")
+FROM search_condition s
+INNER JOIN location l ON s.location_id = l.location_id
+GROUP BY l.state, l.postal;
+
+CREATE TABLE IF NOT EXISTS rollup_city (
+    "city" VARCHAR,
+    "postal" VARCHAR,
+    "state" VARCHAR,
+    "latitude" DOUBLE PRECISION,
+    "longitude" DOUBLE PRECISION,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+DELETE FROM rollup_city;
+
+INSERT INTO rollup_city (city, postal, state, latitude, longitude, cancer, cardiovascular, stroke, depression, rehab, vaccine, diarrhea, obesity, diabetes, searches)
+SELECT l.city, l.postal, l.state, l.latitude, l.longitude,
+    SUM(s."Cancer"),
+    SUM(s."cardiovascular"),
+    SUM(s."stroke"),
+    SUM(s."depression"),
+    SUM(s."rehab"),
+    SUM(s."vaccine"),
+    SUM(s."diarrhea"),
+    SUM(s."obesity"),
+    SUM(s."diabetes"),
+    SUM(s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes")
+FROM search_condition s
+INNER JOIN location l ON s.location_id = l.location_id
+GROUP BY l.city, l.postal, l.state, l.latitude, l.longitude;
+
+CREATE TABLE IF NOT EXISTS rollup_state_year (
+    "state" VARCHAR,
+    "postal" VARCHAR,
+    "year" INTEGER,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+DELETE FROM rollup_state_year;
+
+INSERT INTO rollup_state_year (state, postal, year, cancer, cardiovascular, stroke, depression, rehab, vaccine, diarrhea, obesity, diabetes, searches)
+SELECT l.state, l.postal, s.year,
+    SUM(s."Cancer"),
+    SUM(s."cardiovascular"),
+    SUM(s."stroke"),
+    SUM(s."depression"),
+    SUM(s."rehab"),
+    SUM(s."vaccine"),
+    SUM(s."diarrhea"),
+    SUM(s."obesity"),
+    SUM(s."diabetes"),
+    SUM(s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes")
+FROM search_condition s
+INNER JOIN location l ON s.location_id = l.location_id
+GROUP BY l.state, l.postal, s.year;
+
+CREATE TABLE IF NOT EXISTS rollup_location_year (
+    "state" VARCHAR,
+    "latitude" DOUBLE PRECISION,
+    "longitude" DOUBLE PRECISION,
+    "year" INTEGER,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+DELETE FROM rollup_location_year;
+
+INSERT INTO rollup_location_year (state, latitude, longitude, year, cancer, cardiovascular, stroke, depression, rehab, vaccine, diarrhea, obesity, diabetes, searches)
+SELECT l.state, l.latitude, l.longitude, s.year,
+    SUM(s."Cancer"),
+    SUM(s."cardiovascular"),
+    SUM(s."stroke"),
+    SUM(s."depression"),
+    SUM(s."rehab"),
+    SUM(s."vaccine"),
+    SUM(s."diarrhea"),
+    SUM(s."obesity"),
+    SUM(s."diabetes"),
+    SUM(s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes")
+FROM search_condition s
+INNER JOIN location l ON s.location_id = l.location_id
+GROUP BY l.state, l.latitude, l.longitude, s.year;
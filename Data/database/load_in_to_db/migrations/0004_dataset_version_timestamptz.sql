@@ -0,0 +1,7 @@
+-- 0004: store dataset_version.loaded_at with its time zone
+-- It feeds the Last-Modified header, which is read as UTC. A plain TIMESTAMP
+-- holds now() in the server's local time, so it was off on servers not set to UTC.
+-- Existing values are converted from the session time zone, which is the
+-- zone now() wrote them in.
+ALTER TABLE dataset_version
+    ALTER COLUMN loaded_at TYPE TIMESTAMPTZ USING loaded_at AT TIME ZONE current_setting('TimeZone');
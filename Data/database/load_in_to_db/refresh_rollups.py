@@ -0,0 +1,84 @@
+# refresh_rollups.py - rebuild the summary tables behind the aggregate routes
+#
+# Run after every load:
+#   python refresh_rollups.py
+import sys
+
+from sqlalchemy import text
+
+from dbconnect import get_engine
+
+CONDITIONS = ['Cancer', 'cardiovascular', 'stroke', 'depression', 'rehab',
+              'vaccine', 'diarrhea', 'obesity', 'diabetes']
+
+MEASURE_COLUMNS = ",\n    ".join(f'"{c.lower()}" BIGINT' for c in CONDITIONS) + ',\n    "searches" BIGINT'
+MEASURE_NAMES = ", ".join(c.lower() for c in CONDITIONS) + ", searches"
+MEASURE_SUMS = ",\n    ".join(f'SUM(s."{c}")' for c in CONDITIONS) + \
+    ",\n    SUM(" + " + ".join(f's."{c}"' for c in CONDITIONS) + ")"
+
+# name -> (grouping column DDL, grouping expressions, needs the location join)
+ROLLUPS = {
+    'rollup_year': (
+        '"year" INTEGER',
+        ['s.year'],
+        False
+    ),
+    'rollup_state': (
+        '"state" VARCHAR,\n    "postal" VARCHAR',
+        ['l.state', 'l.postal'],
+        True
+    ),
+    'rollup_city': (
+        '"city" VARCHAR,\n    "postal" VARCHAR,\n    "state" VARCHAR,\n'
+        '    "latitude" DOUBLE PRECISION,\n    "longitude" DOUBLE PRECISION',
+        ['l.city', 'l.postal', 'l.state', 'l.latitude', 'l.longitude'],
+        True
+    ),
+    'rollup_state_year': (
+        '"state" VARCHAR,\n    "postal" VARCHAR,\n    "year" INTEGER',
+        ['l.state', 'l.postal', 's.year'],
+        True
+    ),
+    'rollup_location_year': (
+        '"state" VARCHAR,\n    "latitude" DOUBLE PRECISION,\n'
+        '    "longitude" DOUBLE PRECISION,\n    "year" INTEGER',
+        ['l.state', 'l.latitude', 'l.longitude', 's.year'],
+        True
+    )
+}
+
+
+def rollup_statements(name):
+    """CREATE / DELETE / INSERT statements that rebuild one rollup table"""
+    columns, groups, joined = ROLLUPS[name]
+    group_names = ", ".join(g.split('.')[1] for g in groups)
+    source = "search_condition s"
+    if joined:
+        source += "\nINNER JOIN location l ON s.location_id = l.location_id"
+
+    create = f'CREATE TABLE IF NOT EXISTS {name} (\n    {columns},\n    {MEASURE_COLUMNS}\n)'
+    insert = (f"INSERT INTO {name} ({group_names}, {MEASURE_NAMES})\n"
+              f"SELECT {', '.join(groups)},\n    {MEASURE_SUMS}\n"
+              f"FROM {source}\n"
+              f"GROUP BY {', '.join(groups)}")
+    return [create, f"DELETE FROM {name}", insert]
+
+
+def refresh_rollups(conn):
+    """Rebuild every rollup inside the caller's transaction"""
+    for name in ROLLUPS:
+        for statement in rollup_statements(name):
+            conn.execute(text(statement))
+        count = conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+        print(f"Refreshed {name}: {count} rows")
+
+
+def main():
+    engine = get_engine()
+    # One transaction: readers keep seeing the previous rollups until commit
+    with engine.begin() as conn:
+        refresh_rollups(conn)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,48 +1,160 @@
 -- Data Engineering
+-- Fresh installs only. Existing databases are upgraded with `python migrate.py upgrade`.
 DROP TABLE IF EXISTS location CASCADE;
 DROP TABLE IF EXISTS search_condition CASCADE;
 DROP TABLE IF EXISTS leading_causes_of_death CASCADE;
+DROP TABLE IF EXISTS dataset_version CASCADE;
+DROP TABLE IF EXISTS schema_migrations CASCADE;
+DROP TABLE IF EXISTS rollup_year CASCADE;
+DROP TABLE IF EXISTS rollup_state CASCADE;
+DROP TABLE IF EXISTS rollup_city CASCADE;
+DROP TABLE IF EXISTS rollup_state_year CASCADE;
+DROP TABLE IF EXISTS rollup_location_year CASCADE;
 
 
 CREATE TABLE "location" (
-	"location_id" VARCHAR NOT NULL,
+	"location_id" INTEGER NOT NULL,
     "city" VARCHAR,
 	"state" VARCHAR,
 	"postal" VARCHAR,
-    "latitude" VARCHAR,
-    "longitude" VARCHAR);
+    "latitude" DOUBLE PRECISION,
+    "longitude" DOUBLE PRECISION,
+    CONSTRAINT location_pkey PRIMARY KEY ("location_id"));
 
 
 CREATE TABLE "search_condition" (
-    "location_id" VARCHAR   NOT NULL,
-    "Cancer" VARCHAR,
-    "cardiovascular" VARCHAR,
-    "stroke" VARCHAR,
-    "depression" VARCHAR,
-    "rehab" VARCHAR,
-    "vaccine" VARCHAR,
-    "diarrhea" VARCHAR,
-    "obesity" VARCHAR,
-    "diabetes" VARCHAR,
-    "year" VARCHAR);
+    "location_id" INTEGER   NOT NULL,
+    "Cancer" SMALLINT,
+    "cardiovascular" SMALLINT,
+    "stroke" SMALLINT,
+    "depression" SMALLINT,
+    "rehab" SMALLINT,
+    "vaccine" SMALLINT,
+    "diarrhea" SMALLINT,
+    "obesity" SMALLINT,
+    "diabetes" SMALLINT,
+    "year" INTEGER NOT NULL,
+    CONSTRAINT search_condition_location_id_fkey FOREIGN KEY ("location_id") REFERENCES "location" ("location_id"));
+
+CREATE INDEX search_condition_year_location_idx ON search_condition ("year", "location_id");
+CREATE UNIQUE INDEX search_condition_location_year_idx ON search_condition ("location_id", "year");
 
 
 CREATE TABLE "leading_causes_of_death" (
-    "Diseases_of_heart" VARCHAR,
-    "Malignant_neoplasms" VARCHAR,
-    "Accidents" VARCHAR,
-    "Respiratory" VARCHAR,
-    "Cerebrovascular" VARCHAR,
-    "Alzheimer" VARCHAR,
-    "Diabetes" VARCHAR,
-    "Influenza_and_pneumonia" VARCHAR,
-    "Nephrosis" VARCHAR,
-    "Suicide"  VARCHAR,
-    "year" VARCHAR
+    "Diseases_of_heart" REAL,
+    "Malignant_neoplasms" REAL,
+    "Accidents" REAL,
+    "Respiratory" REAL,
+    "Cerebrovascular" REAL,
+    "Alzheimer" REAL,
+    "Diabetes" REAL,
+    "Influenza_and_pneumonia" REAL,
+    "Nephrosis" REAL,
+    "Suicide"  REAL,
+    "year" INTEGER
+);
+
+
+-- Bumped on every reload so app workers know to rebuild their in-memory snapshot
+CREATE TABLE "dataset_version" (
+    "version" INTEGER NOT NULL,
+    "loaded_at" TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+INSERT INTO "dataset_version" ("version") VALUES (1);
 
 
+-- Summary tables for the aggregate routes, filled by refresh_rollups.py after each load
+CREATE TABLE rollup_year (
+    "year" INTEGER,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
 
+CREATE TABLE rollup_state (
+    "state" VARCHAR,
+    "postal" VARCHAR,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
 
+CREATE TABLE rollup_city (
+    "city" VARCHAR,
+    "postal" VARCHAR,
+    "state" VARCHAR,
+    "latitude" DOUBLE PRECISION,
+    "longitude" DOUBLE PRECISION,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+CREATE TABLE rollup_state_year (
+    "state" VARCHAR,
+    "postal" VARCHAR,
+    "year" INTEGER,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+CREATE TABLE rollup_location_year (
+    "state" VARCHAR,
+    "latitude" DOUBLE PRECISION,
+    "longitude" DOUBLE PRECISION,
+    "year" INTEGER,
+    "cancer" BIGINT,
+    "cardiovascular" BIGINT,
+    "stroke" BIGINT,
+    "depression" BIGINT,
+    "rehab" BIGINT,
+    "vaccine" BIGINT,
+    "diarrhea" BIGINT,
+    "obesity" BIGINT,
+    "diabetes" BIGINT,
+    "searches" BIGINT
+);
+
+
+-- The tables above already match these migrations
+CREATE TABLE "schema_migrations" (
+    "version" INTEGER PRIMARY KEY,
+    "name" VARCHAR NOT NULL,
+    "applied_at" TIMESTAMP NOT NULL DEFAULT now()
+);
 
+INSERT INTO "schema_migrations" ("version", "name") VALUES
+    (1, 'typed_schema'),
+    (2, 'keyset_index'),
+    (3, 'rollups'),
+    (4, 'dataset_version_timestamptz');
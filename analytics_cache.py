@@ -0,0 +1,100 @@
+# analytics_cache.py - CACHING FOR THE CHATBOT'S ANALYTICS HELPERS
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, has_request_context
+
+TTL_SECONDS = float(os.environ.get('ANALYTICS_CACHE_TTL', '300'))
+MAX_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', '512'))
+
+_MISSING = object()
+
+#################################################
+# Cross-Request Cache
+##################################################
+
+class AnalyticsCache:
+    """TTL- and size-bounded LRU of helper results for the current dataset version
+
+    Entries are dropped when they are older than ttl seconds, when the
+    cache holds more than max_entries, or all at once when the dataset
+    version changes. Callers must treat the cached values as read-only.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _reset_for(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version, key, default=None):
+        with self._lock:
+            self._reset_for(version)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, version, key, value):
+        with self._lock:
+            self._reset_for(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'version': self._version}
+
+#################################################
+# Helper Decorator
+##################################################
+
+def memoized(cache, get_version):
+    """Decorator factory: memoize a helper per request, then across requests
+
+    Inside a request, repeated calls with the same arguments return the
+    first result without touching the shared cache, so one chat turn sees
+    one consistent answer. Empty results are not shared because the helpers
+    also return them when a query fails.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            memo = g.setdefault('analytics_memo', {}) if has_request_context() else None
+            if memo is not None and key in memo:
+                return memo[key]
+
+            version, _ = get_version()
+            value = cache.get(version, key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                if value:
+                    cache.put(version, key, value)
+            if memo is not None:
+                memo[key] = value
+            return value
+        return wrapper
+    return decorator
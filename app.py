@@ -1,17 +1,29 @@
 # app.py - COMPLETE PRODUCTION-READY HEALTH ANALYTICS CHATBOT
 import os
-import json
 import re
 import uuid
 import math
+import contextvars
 from datetime import datetime
-from textblob import TextBlob
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, abort, jsonify, render_template, request, stream_with_context, url_for
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import pandas.io.sql as pdsql
 from dotenv import load_dotenv
 import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from snapshot import get_snapshot, current_dataset_version, MEASURES
+from http_cache import conditional, ResponseCache
+from table_query import (TABLE_ROUTES, QueryParamError, parse_table_query, build_table_query, next_cursor,
+                         is_table_query)
+from olap_query import QUERY_MEASURES, parse_olap_query, run_olap_query
+from export import EXPORT_FORMATS, ENCODERS, stream_query, stream_frame
+from entity_matcher import KeywordIndex, get_entity_matcher
+from analytics_cache import AnalyticsCache, memoized
+from session_store import create_session_store
+from sentiment import create_sentiment_scorer, sentiment_label
+from correlation import get_correlations
+from top_states import TOP_STATES_K, get_top_states
 
 #################################################
 # Database Setup
@@ -37,25 +49,54 @@ app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+def dataset_version():
+    """(version, loaded_at) of the dataset currently in the database"""
+    return current_dataset_version(engine)
+
+# Read-only data routes answer 304 until the dataset version is bumped,
+# and serve precompressed payloads from this worker's cache in between
+response_cache = ResponseCache()
+data_route = conditional(dataset_version, cache=response_cache)
+
+# The chatbot's query helpers are memoized per request and shared across
+# requests until their TTL runs out or the dataset version is bumped
+analytics_cache = AnalyticsCache()
+cached_query = memoized(analytics_cache, dataset_version)
+
+# Fully rendered chatbot answers, keyed by response type and entities
+rendered_cache = AnalyticsCache(
+    max_entries=int(os.environ.get('RENDERED_CACHE_MAX_ENTRIES', '1024')),
+    ttl=float(os.environ.get('RENDERED_CACHE_TTL', '300')))
+
+# A chat turn's independent queries run side by side on this bounded pool.
+# CHAT_FETCH_TIMEOUT is one deadline for all of a turn's queries, counted from
+# submission, so time spent waiting for a free worker counts against it; what
+# has not finished by then is left out of the answer
+FETCH_TIMEOUT = float(os.environ.get('CHAT_FETCH_TIMEOUT', '5'))
+fetch_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('CHAT_FETCH_WORKERS', '8')),
+                                thread_name_prefix='chat-fetch')
+FETCH_TIMED_OUT = object()
+
 #################################################
 # Database Query Helpers
 ##################################################
 
+@cached_query
 def get_health_condition_stats():
     """Get comprehensive statistics for all health conditions"""
     try:
         sql = """
         SELECT 
-            SUM("Cancer") AS Cancer,
-            SUM("cardiovascular") AS Cardiovascular,
-            SUM("stroke") AS Stroke,
-            SUM("depression") AS Depression,
-            SUM("rehab") AS Rehab,
-            SUM("vaccine") AS Vaccine,
-            SUM("diarrhea") AS Diarrhea,
-            SUM("obesity") AS Obesity,
-            SUM("diabetes") AS Diabetes
-        FROM search_condition
+            SUM(cancer) AS "cancer",
+            SUM(cardiovascular) AS "cardiovascular",
+            SUM(stroke) AS "stroke",
+            SUM(depression) AS "depression",
+            SUM(rehab) AS "rehab",
+            SUM(vaccine) AS "vaccine",
+            SUM(diarrhea) AS "diarrhea",
+            SUM(obesity) AS "obesity",
+            SUM(diabetes) AS "diabetes"
+        FROM rollup_year
         """
         df = pdsql.read_sql(sql, engine)
         return df.iloc[0].to_dict()
@@ -63,40 +104,29 @@ def get_health_condition_stats():
         print(f"Error in get_health_condition_stats: {e}")
         return {}
 
-def get_top_states_for_condition(condition):
-    """Get top 5 states for a specific health condition"""
+def get_top_states_for_condition(condition, year=None, k=5):
+    """Get the top k states for a health condition, overall or in one year"""
     try:
-        valid_conditions = ['cancer', 'cardiovascular', 'stroke', 'depression', 
-                           'rehab', 'vaccine', 'diarrhea', 'obesity', 'diabetes']
-        
-        if condition.lower() not in valid_conditions:
+        top_states = get_top_states(engine)
+        if top_states is None:
             return []
-        
-        sql = f"""
-        SELECT 
-            l.state,
-            SUM(s."{condition.capitalize()}") AS search_volume
-        FROM location l
-        INNER JOIN search_condition s ON s.location_id = l.location_id
-        GROUP BY l.state
-        ORDER BY search_volume DESC
-        LIMIT 5
-        """
-        df = pdsql.read_sql(sql, engine)
-        return df.to_dict('records')
+        return top_states.top(condition, year, k)
     except Exception as e:
         print(f"Error in get_top_states_for_condition: {e}")
         return []
 
+@cached_query
 def get_yearly_trend_for_condition(condition):
     """Get yearly search trend for a specific condition"""
     try:
+        if condition.lower() not in MEASURES:
+            return []
+        
         sql = f"""
         SELECT 
             year,
-            SUM("{condition.capitalize()}") AS search_volume
-        FROM search_condition
-        GROUP BY year
+            {condition.lower()} AS search_volume
+        FROM rollup_year
         ORDER BY year
         """
         df = pdsql.read_sql(sql, engine)
@@ -105,58 +135,71 @@ def get_yearly_trend_for_condition(condition):
         print(f"Error in get_yearly_trend_for_condition: {e}")
         return []
 
+def get_correlation_matrix(state=None, year=None):
+    """Correlation matrix of all conditions, overall or for one state or year"""
+    try:
+        correlations = get_correlations(engine)
+        if correlations is None:
+            return {}
+        return correlations.to_dict(state, year) or {}
+    except Exception as e:
+        print(f"Error in get_correlation_matrix: {e}")
+        return {}
+
 def get_correlation_between_conditions(condition1, condition2):
     """Calculate correlation between two health conditions"""
     try:
-        sql = f"""
-        SELECT 
-            corr("{condition1.capitalize()}", "{condition2.capitalize()}") as correlation_coefficient
-        FROM search_condition
-        """
-        df = pdsql.read_sql(sql, engine)
-        corr = df.iloc[0]['correlation_coefficient']
-        return float(corr) if corr is not None else 0.0
+        correlations = get_correlations(engine)
+        corr = correlations.coefficient(condition1, condition2) if correlations else None
+        return corr if corr is not None else 0.0
     except Exception as e:
         print(f"Error in get_correlation_between_conditions: {e}")
         return 0.0
 
+@cached_query
 def get_state_specific_data(state_name, condition=None):
     """Get data for a specific state"""
     try:
         if condition:
+            if condition.lower() not in MEASURES:
+                return []
             sql = f"""
             SELECT 
-                s.year,
-                SUM(s."{condition.capitalize()}") as search_volume
-            FROM search_condition s
-            INNER JOIN location l ON s.location_id = l.location_id
-            WHERE l.state = '{state_name}'
-            GROUP BY s.year
-            ORDER BY s.year
+                year,
+                SUM({condition.lower()}) as search_volume
+            FROM rollup_state_year
+            WHERE state = :state
+            GROUP BY year
+            ORDER BY year
             """
         else:
-            sql = f"""
+            sql = """
             SELECT 
-                s.year,
-                SUM(s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + 
-                    s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes") as total_searches
-            FROM search_condition s
-            INNER JOIN location l ON s.location_id = l.location_id
-            WHERE l.state = '{state_name}'
-            GROUP BY s.year
-            ORDER BY s.year
+                year,
+                SUM(searches) as total_searches
+            FROM rollup_state_year
+            WHERE state = :state
+            GROUP BY year
+            ORDER BY year
             """
         
-        df = pdsql.read_sql(sql, engine)
+        df = pdsql.read_sql(text(sql), engine, params={'state': state_name})
         return df.to_dict('records')
     except Exception as e:
         print(f"Error in get_state_specific_data: {e}")
         return []
 
+@cached_query
 def get_city_specific_data(city_name):
-    """Get data for a specific city"""
+    """Get every year of data for the one area city_name refers to"""
     try:
-        sql = f"""
+        # Resolve the name in memory, then look the area up by its key
+        areas = get_entity_matcher(engine).cities.resolve(city_name)
+        if len(areas) != 1:
+            # Unknown, or a name several areas share
+            return []
+        
+        sql = """
         SELECT 
             s.year,
             l.city,
@@ -172,16 +215,86 @@ def get_city_specific_data(city_name):
             s."diabetes"
         FROM search_condition s
         INNER JOIN location l ON s.location_id = l.location_id
-        WHERE l.city ILIKE '%{city_name}%'
+        WHERE s.location_id = :location_id
         ORDER BY s.year
-        LIMIT 5
         """
-        df = pdsql.read_sql(sql, engine)
+        df = pdsql.read_sql(text(sql), engine, params={'location_id': areas[0]})
         return df.to_dict('records')
     except Exception as e:
         print(f"Error in get_city_specific_data: {e}")
         return []
 
+# SQL fallback for each aggregate route, read from the rollup tables
+AGGREGATE_SQL = {
+    'searchbyyear': """
+        SELECT year, searches
+        FROM rollup_year
+        ORDER BY year;
+    """,
+    'searchyearandcondition': """
+        SELECT year, cancer, cardiovascular, stroke, depression, rehab, vaccine, diarrhea, obesity, diabetes
+        FROM rollup_year
+        ORDER BY year;
+    """,
+    'searchbycity': """
+        SELECT city, postal, state, latitude, longitude, searches
+        FROM rollup_city
+        ORDER BY city;
+    """,
+    'searchbystate': """
+        SELECT state, postal, searches
+        FROM rollup_state;
+    """,
+    'bystateandyear': """
+        SELECT state, latitude, longitude, year, searches
+        FROM rollup_location_year
+        ORDER BY year;
+    """,
+    'mostsserached': """
+        SELECT state, cancer, cardiovascular, stroke, depression, rehab, vaccine, diarrhea, obesity, diabetes
+        FROM rollup_state
+        ORDER BY cancer DESC, cardiovascular DESC, stroke DESC, depression DESC, rehab DESC, vaccine DESC, diarrhea DESC, diabetes DESC, obesity DESC
+        LIMIT 10;
+    """,
+    'totalcondition': """
+        SELECT SUM (cancer) AS cancer, SUM (cardiovascular) AS cardiovascular, SUM (stroke) AS stroke, SUM (depression) AS depression, SUM (rehab) AS rehab, SUM (vaccine) AS vaccine, SUM (diarrhea) AS diarrhea, SUM (obesity) AS obesity, SUM (diabetes) AS diabetes
+        FROM rollup_year
+    """
+}
+
+def query_aggregate(name):
+    """Answer a legacy route aggregate from the in-memory snapshot, falling back to the rollup tables"""
+    snapshot = get_snapshot(engine)
+    if snapshot is not None:
+        return snapshot.run(name)
+    return pdsql.read_sql(AGGREGATE_SQL[name], engine)
+
+def table_response(df, index):
+    """Serialize a result set as the orient='table' payload and return its bytes as-is"""
+    df.set_index(index, inplace=True)
+    payload = df.to_json(orient='table').encode('utf-8')
+    return app.response_class(payload, mimetype=app.json.mimetype)
+
+def table_page(name):
+    """Projected, filtered and keyset-paginated slice of a table route"""
+    try:
+        query = parse_table_query(name, request.args)
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    sql, params = build_table_query(name, **query)
+    df = pdsql.read_sql(text(sql), engine, params=params)
+    cursor = next_cursor(name, df, query['limit'])
+
+    response = table_response(df, TABLE_ROUTES[name]['index'])
+    if cursor:
+        args = request.args.to_dict()
+        args['cursor'] = cursor
+        args.setdefault('limit', query['limit'])
+        response.headers['X-Next-Cursor'] = cursor
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
+
 def get_team_member_details():
     """Get detailed information about team members"""
     return {
@@ -239,10 +352,13 @@ def get_team_member_details():
 class AIHealthAnalyticsChatbot:
     def __init__(self):
         self.knowledge_base = self._build_knowledge_base()
-        self.conversation_history = {}
+        self.conversation_history = create_session_store()
         self.condition_definitions = self._get_condition_definitions()
-        self.analytical_cache = {}
+        self.analytical_cache = analytics_cache
+        self.rendered_cache = rendered_cache
         self.user_context = {}
+        self.keyword_index = KeywordIndex(self.knowledge_base)
+        self.sentiment_scorer = create_sentiment_scorer()
         
     def _build_knowledge_base(self):
         """Comprehensive knowledge base with fuzzy matching"""
@@ -344,7 +460,7 @@ class AIHealthAnalyticsChatbot:
             'correlation_analysis': {
                 'category': 'analysis',
                 'title': 'Correlation Analysis',
-                'keywords': ['correlation', 'relationship', 'linked', 'associated', 'connected', 'pearson', 'coefficient', 'correlate', 'relation', 'link'],
+                'keywords': ['correlation', 'correlations', 'correlation analysis', 'relationship', 'relationships', 'linked', 'associated', 'connected', 'pearson', 'coefficient', 'correlate', 'relation', 'link'],
                 'aliases': ['correlation', 'relationship', 'how related']
             },
             'time_series': {
@@ -397,80 +513,8 @@ class AIHealthAnalyticsChatbot:
         }
     
     def _extract_entities(self, question):
-        """Extract entities with fuzzy matching"""
-        entities = {
-            'condition': None,
-            'state': None,
-            'city': None,
-            'year': None,
-            'member': None,
-            'intent': None
-        }
-        
-        question_lower = question.lower()
-        
-        # Check for greetings first
-        greeting_terms = ['hi', 'hello', 'hey', 'greetings']
-        for term in greeting_terms:
-            if term in question_lower.split():
-                entities['intent'] = 'greeting'
-                break
-        
-        # Check for thanks
-        thanks_terms = ['thanks', 'thank', 'appreciate']
-        for term in thanks_terms:
-            if term in question_lower:
-                entities['intent'] = 'thanks'
-                break
-        
-        # Check for farewell
-        farewell_terms = ['bye', 'goodbye', 'see you', 'farewell']
-        for term in farewell_terms:
-            if term in question_lower:
-                entities['intent'] = 'farewell'
-                break
-        
-        # Check for help
-        if 'help' in question_lower or 'what can' in question_lower:
-            entities['intent'] = 'help'
-        
-        # Extract condition with fuzzy matching
-        conditions = ['cancer', 'diabetes', 'depression', 'obesity', 'cardiovascular', 
-                     'stroke', 'vaccine', 'rehab', 'diarrhea']
-        for condition in conditions:
-            if condition in question_lower:
-                entities['condition'] = condition
-                break
-            # Check for variations
-            if condition == 'cardiovascular' and ('heart' in question_lower or 'cardiac' in question_lower):
-                entities['condition'] = condition
-            elif condition == 'stroke' and 'brain attack' in question_lower:
-                entities['condition'] = condition
-        
-        # Extract state
-        states = ['california', 'texas', 'new york', 'florida', 'illinois', 'pennsylvania',
-                 'ohio', 'georgia', 'north carolina', 'michigan', 'new jersey', 'virginia',
-                 'washington', 'arizona', 'massachusetts', 'tennessee', 'indiana', 'missouri',
-                 'maryland', 'wisconsin', 'colorado', 'minnesota', 'south carolina', 'alabama',
-                 'louisiana', 'kentucky', 'oregon', 'oklahoma', 'connecticut', 'iowa']
-        for state in states:
-            if state in question_lower:
-                entities['state'] = state.title()
-                break
-        
-        # Extract year
-        year_match = re.search(r'\b(200[4-9]|201[0-7])\b', question)
-        if year_match:
-            entities['year'] = year_match.group()
-        
-        # Extract team member
-        members = ['ermias', 'amanda', 'amos', 'damola', 'maria']
-        for member in members:
-            if member in question_lower:
-                entities['member'] = member.title()
-                break
-        
-        return entities
+        """Extract conditions, states, cities, years, members and intents in one pass"""
+        return get_entity_matcher(engine).extract(question)
     
     def _analyze_question_sophistication(self, question):
         """Analyze question complexity"""
@@ -516,98 +560,169 @@ class AIHealthAnalyticsChatbot:
         )
         
         try:
-            blob = TextBlob(question)
-            analysis['sentiment'] = 'positive' if blob.sentiment.polarity > 0.1 else \
-                                  'negative' if blob.sentiment.polarity < -0.1 else 'neutral'
+            analysis['sentiment'] = sentiment_label(self.sentiment_scorer.polarity(question))
         except:
             analysis['sentiment'] = 'neutral'
         
         return analysis
     
     def _determine_response_type(self, question, entities):
-        """Determine response type with fuzzy matching"""
+        """Determine response type and its keyword match score"""
         question_lower = question.lower()
+        scores = self.keyword_index.scores(question)
         
         # Check for special intents first
-        if entities.get('intent') == 'greeting':
-            return 'greeting'
-        elif entities.get('intent') == 'thanks':
-            return 'thanks'
-        elif entities.get('intent') == 'farewell':
-            return 'farewell'
-        elif entities.get('intent') == 'help':
-            return 'help'
-        
+        if entities.get('intent') in ['greeting', 'thanks', 'farewell', 'help']:
+            response_type = entities['intent']
         # Check for team members
-        if entities.get('member'):
-            return 'specific_member'
-        
+        elif entities.get('member'):
+            response_type = 'specific_member'
+        # Correlation words are common ("link", "connected"), so they only win
+        # next to a condition or as the best keyword match
+        elif scores.get('correlation_analysis') and (
+                entities.get('condition') or self.keyword_index.best(scores) == 'correlation_analysis'):
+            response_type = 'correlation_analysis'
         # Check for specific conditions
-        if entities.get('condition'):
-            return 'specific_condition'
-        
+        elif entities.get('condition'):
+            response_type = 'specific_condition'
         # Check for states
-        if entities.get('state'):
-            return 'state_analysis'
-        
-        # Fuzzy keyword matching
-        for response_type, info in self.knowledge_base.items():
-            # Check exact keywords
-            for keyword in info.get('keywords', []):
-                if keyword in question_lower:
-                    return response_type
-            
-            # Check aliases
-            aliases = info.get('aliases', [])
-            if isinstance(aliases, dict):
-                for alias_list in aliases.values():
-                    if any(alias in question_lower for alias in alias_list):
-                        return response_type
-            elif isinstance(aliases, list):
-                if any(alias in question_lower for alias in aliases):
-                    return response_type
+        elif entities.get('state'):
+            response_type = 'state_analysis'
+        # Check for cities (DMA regions)
+        elif entities.get('city'):
+            response_type = 'city_analysis'
+        # Keyword and alias matching
+        else:
+            response_type = self.keyword_index.best(scores)
+        
+        if response_type:
+            return response_type, scores.get(response_type, 0)
         
         # Default based on question content
         if any(word in question_lower for word in ['how many', 'metric', 'statistic', 'number']):
-            return 'metrics_insights'
+            return 'metrics_insights', 0
         elif any(word in question_lower for word in ['team', 'who', 'person', 'people']):
-            return 'team_members'
+            return 'team_members', 0
         elif any(word in question_lower for word in ['find', 'result', 'insight', 'discovery']):
-            return 'key_findings'
+            return 'key_findings', 0
         elif any(word in question_lower for word in ['how', 'method', 'process', 'approach']):
-            return 'methodology'
+            return 'methodology', 0
         else:
-            return 'project_overview'
+            return 'project_overview', 0
+    
+    def _data_requirements(self, entities, response_type):
+        """(helper, args) pairs the answer for these entities needs, without duplicates"""
+        requirements = []
+        if entities.get('condition'):
+            condition = entities['condition']
+            requirements += [(get_health_condition_stats, ()),
+                             (get_top_states_for_condition, (condition,)),
+                             (get_yearly_trend_for_condition, (condition,))]
+        if entities.get('state'):
+            requirements.append((get_state_specific_data, (entities['state'], entities.get('condition'))))
+        if entities.get('city') and len(self._city_areas(entities['city'])) == 1:
+            requirements.append((get_city_specific_data, (entities['city'],)))
+        if response_type in ['metrics_insights', 'key_findings', 'project_overview']:
+            requirements += [(get_health_condition_stats, ()),
+                             (get_top_states_for_condition, ('cancer',))]
+        if response_type == 'correlation_analysis':
+            requirements.append((get_correlation_matrix, self._correlation_scope(entities)))
+        return list(dict.fromkeys(requirements))
+    
+    def _city_areas(self, city):
+        """location_ids of the areas a city entity refers to; several when the name is shared"""
+        return get_entity_matcher(engine).cities.resolve(city)
+    
+    def _correlation_scope(self, entities):
+        """(state, year) of the correlation matrix to answer from; a state wins over a year"""
+        if entities.get('state'):
+            return entities['state'], None
+        return None, entities.get('year')
+    
+    def _iter_fetches(self, requirements, fetched=None):
+        """Run the (helper, args) pairs not already in fetched concurrently
+        
+        Yields ((helper, args), result) as each one finishes. The helpers run
+        in a copy of the caller's context, so they see the same flask.g and
+        share its per-request memo. Whatever has not finished FETCH_TIMEOUT
+        seconds after submission is yielded as FETCH_TIMED_OUT. Fetches still
+        queued then are cancelled so they do not hold the pool; ones already
+        running finish in the background and fill the analytics cache.
+        """
+        fetched = fetched or {}
+        pending = {fetch_pool.submit(contextvars.copy_context().run, helper, *args): (helper, args)
+                   for helper, args in requirements if (helper, args) not in fetched}
+        finished = set()
+        try:
+            for future in as_completed(pending, timeout=FETCH_TIMEOUT):
+                finished.add(future)
+                yield pending[future], future.result()
+        except TimeoutError:
+            for future, (helper, args) in pending.items():
+                if future not in finished:
+                    future.cancel()
+                    print(f"Data fetch timed out: {helper.__name__}{args}")
+                    yield (helper, args), FETCH_TIMED_OUT
+        finally:
+            # Also reached when a streaming client goes away mid-answer
+            for future in pending:
+                future.cancel()
+    
+    def _fetch_all(self, requirements, fetched=None):
+        """Run each (helper, args) pair not already in fetched, once"""
+        fetched = dict(fetched or {})
+        fetched.update(self._iter_fetches(requirements, fetched))
+        return fetched
     
-    def _fetch_data_for_response(self, entities, response_type):
-        """Fetch relevant data from database"""
+    def _fetch_data_for_response(self, entities, response_type, fetched=None):
+        """Fetch relevant data from database, reusing anything already in fetched"""
         data = {}
         
         try:
+            fetched = self._fetch_all(self._data_requirements(entities, response_type), fetched)
+            
+            def result(helper, *args):
+                value = fetched[(helper, args)]
+                if value is FETCH_TIMED_OUT:
+                    # Answer without it, and keep the answer out of the rendered cache
+                    data['error'] = f"{helper.__name__} timed out"
+                    return {} if helper in [get_health_condition_stats, get_correlation_matrix] else []
+                if not value:
+                    # The helpers return an empty result when their query fails, so an
+                    # answer built on one is not cached, like the helpers' own results
+                    data['error'] = f"{helper.__name__} returned no data"
+                return value
+            
             if entities.get('condition'):
                 condition = entities['condition']
-                stats = get_health_condition_stats()
-                top_states = get_top_states_for_condition(condition)
-                yearly_trend = get_yearly_trend_for_condition(condition)
+                stats = result(get_health_condition_stats)
+                top_states = result(get_top_states_for_condition, condition)
+                yearly_trend = result(get_yearly_trend_for_condition, condition)
                 
                 data['condition_stats'] = {
                     'definition': self.condition_definitions.get(condition, {}),
                     'top_states': top_states[:3] if top_states else [],
                     'yearly_trend': yearly_trend,
-                    'total_searches': stats.get(condition.capitalize(), 0) if stats else 0
+                    'total_searches': stats.get(condition.lower(), 0) if stats else 0
                 }
             
             if entities.get('state'):
                 state = entities['state']
                 condition = entities.get('condition')
-                state_data = get_state_specific_data(state, condition)
+                state_data = result(get_state_specific_data, state, condition)
                 data['state_stats'] = state_data
             
+            if entities.get('city') and len(self._city_areas(entities['city'])) == 1:
+                data['city_stats'] = result(get_city_specific_data, entities['city'])
+            
             if response_type in ['metrics_insights', 'key_findings', 'project_overview']:
-                stats = get_health_condition_stats()
+                stats = result(get_health_condition_stats)
                 if stats:
                     data['health_stats'] = stats
-                    data['top_states_cancer'] = get_top_states_for_condition('cancer')[:3]
+                    data['top_states_cancer'] = result(get_top_states_for_condition, 'cancer')[:3]
+            
+            if response_type == 'correlation_analysis':
+                data['correlations'] = result(get_correlation_matrix, *self._correlation_scope(entities))
             
             if response_type in ['team_members', 'specific_member']:
                 data['team_data'] = get_team_member_details()
@@ -632,7 +747,7 @@ class AIHealthAnalyticsChatbot:
         
         return data
     
-    def _generate_response(self, response_type, data, entities, question_analysis):
+    def _generate_response(self, response_type, data, entities, question_analysis=None):
         """Generate appropriate response"""
         
         # Handle special intents first
@@ -667,10 +782,14 @@ class AIHealthAnalyticsChatbot:
             return self._generate_condition_response(entities['condition'], data)
         elif response_type == 'state_analysis' and entities.get('state'):
             return self._generate_state_response(entities['state'], data)
+        elif response_type == 'city_analysis' and entities.get('city'):
+            return self._generate_city_response(entities['city'], data)
         elif response_type == 'specific_member' and entities.get('member'):
             return self._generate_member_response(entities['member'], data)
         elif response_type == 'key_findings':
             return self._generate_findings_response(data)
+        elif response_type == 'correlation_analysis':
+            return self._generate_correlation_response(data, entities)
         elif response_type == 'project_overview':
             return self._generate_project_overview()
         elif response_type == 'data_sources':
@@ -848,6 +967,43 @@ How can I assist you today?"""
         
         return response
     
+    def _generate_city_response(self, city, data):
+        """Generate response for a specific city (DMA region)"""
+        city_data = data.get('city_stats', [])
+        areas = self._city_areas(city)
+        
+        if len(areas) > 1:
+            cities = get_entity_matcher(engine).cities
+            response = f"**{city}** could mean more than one area 🏙️\n\n"
+            for location_id in areas:
+                response += f"• {cities.label(location_id)}\n"
+            response += "\nWhich one do you mean? Ask again with its full name.\n"
+            return response
+        
+        response = f"**{city} - Health Search Analysis** 🏙️\n\n"
+        
+        if not city_data:
+            response += f"Search data for the **{city}** area is not available right now. "
+            response += "Try asking about its state, or about a specific condition.\n"
+            return response
+        
+        conditions = ['Cancer', 'cardiovascular', 'stroke', 'depression', 'rehab',
+                      'vaccine', 'diarrhea', 'obesity', 'diabetes']
+        totals = {c: sum(row.get(c) or 0 for row in city_data) for c in conditions}
+        total_searches = sum(totals.values())
+        years = [row.get('year') for row in city_data]
+        
+        response += f"**📊 Summary Statistics:**\n"
+        response += f"• State: **{city_data[0].get('state', 'Unknown')}**\n"
+        response += f"• Total Searches ({min(years)}-{max(years)}): **{total_searches:,.0f}**\n"
+        
+        response += f"\n**🔍 Most Searched Conditions:**\n"
+        ranked = sorted(totals.items(), key=lambda item: -item[1])
+        for i, (condition, searches) in enumerate(ranked[:3], 1):
+            response += f"  {i}. {condition.capitalize()}: {searches:,.0f} searches\n"
+        
+        return response
+    
     def _generate_member_response(self, member, data):
         """Generate response for specific team member"""
         member_data = data.get('member_data', {})
@@ -960,6 +1116,40 @@ How can I assist you today?"""
         
         return response
     
+    def _generate_correlation_response(self, data, entities):
+        """Generate response from the condition correlation matrix"""
+        correlations = data.get('correlations')
+        scope = next((s for s in self._correlation_scope(entities) if s), None)
+        
+        response = f"**🔗 Condition Correlations{f' - {scope}' if scope else ''}** 📈\n\n"
+        
+        if not correlations:
+            response += "Correlation data is not available for this selection right now. "
+            response += "Try asking about all states, a single state or a single year between 2004 and 2017.\n"
+            return response
+        
+        conditions = correlations['conditions']
+        matrix = correlations['matrix']
+        response += f"Pearson correlations across **{correlations['rows']:,}** search records.\n\n"
+        
+        condition = entities.get('condition')
+        if condition in conditions:
+            i = conditions.index(condition)
+            pairs = [(other, matrix[i][j]) for j, other in enumerate(conditions) if j != i]
+            response += f"**{condition.capitalize()} compared with other conditions:**\n"
+        else:
+            pairs = [(f"{a} & {b}", matrix[i][j]) for i, a in enumerate(conditions)
+                     for j, b in enumerate(conditions) if i < j]
+            response += "**Most strongly related conditions:**\n"
+        
+        pairs = sorted([p for p in pairs if p[1] is not None], key=lambda p: -abs(p[1]))
+        for name, r in pairs[:5]:
+            strength = 'strong' if abs(r) >= 0.7 else 'moderate' if abs(r) >= 0.4 else 'weak'
+            response += f"• {name.title()}: r={r:.2f} ({strength})\n"
+        
+        response += "\n**💡 Note:** Correlation shows searches rising and falling together, not that one condition causes another.\n"
+        return response
+    
     def _generate_project_overview(self):
         """Generate project overview response"""
         response = "**🏥 Eagle Health Analytics Project Overview** 🦅\n\n"
@@ -1123,6 +1313,12 @@ How can I assist you today?"""
         if 'state_stats' in data:
             summary['state_data_points'] = len(data['state_stats'])
         
+        if 'city_stats' in data:
+            summary['city_data_points'] = len(data['city_stats'])
+        
+        if data.get('correlations'):
+            summary['correlation_rows'] = data['correlations']['rows']
+        
         return summary
     
     def _get_followup_questions(self, response_type, entities):
@@ -1145,6 +1341,26 @@ How can I assist you today?"""
                 f"Compare {state} with another state",
                 f"Analyze specific conditions in {state}"
             ]
+        elif response_type == 'city_analysis' and len(self._city_areas(entities.get('city') or '')) > 1:
+            cities = get_entity_matcher(engine).cities
+            followups = [f"Tell me about {cities.label(location_id)}"
+                         for location_id in self._city_areas(entities['city'])]
+        elif response_type == 'city_analysis':
+            city = entities.get('city', '')
+            followups = [
+                f"What are the top conditions in {city}?",
+                "Which states search the most?",
+                "Show me geographic patterns",
+                "Compare with another city"
+            ]
+        elif response_type == 'correlation_analysis':
+            condition = entities.get('condition') or 'diabetes'
+            followups = [
+                f"Tell me about {condition}",
+                f"Show {condition} correlations in California",
+                f"Show {condition} correlations in 2017",
+                "Explain the methodology"
+            ]
         elif response_type == 'team_members':
             followups = [
                 "What are the team roles?",
@@ -1169,65 +1385,170 @@ How can I assist you today?"""
         
         return followups
     
-    def get_response(self, question, session_id=None, context=None):
-        """Main method to get AI-enhanced response"""
+    def _render_key(self, response_type, entities):
+        """Rendered-cache key, or None for answers that are picked at random"""
+        if response_type in ['greeting', 'farewell']:
+            return None
+        return (response_type, tuple(sorted(entities.items())))
+    
+    def _cached_render(self, response_type, entities):
+        """Rendered answer from the cache, or None"""
+        key = self._render_key(response_type, entities)
+        if key is None:
+            return None
+        version, _ = dataset_version()
+        rendered = self.rendered_cache.get(version, key)
+        return dict(rendered, cached=True) if rendered is not None else None
+    
+    def _render_response(self, response_type, entities, fetched=None):
+        """Answer text and data summary for a response type and its entities
+        
+        These depend only on their arguments and the loaded data, so they are
+        cached per dataset version. Greetings and farewells are picked at
+        random and always rendered fresh.
+        """
+        rendered = self._cached_render(response_type, entities)
+        if rendered is not None:
+            return rendered
+        
+        version, _ = dataset_version()
+        data = self._fetch_data_for_response(entities, response_type, fetched)
+        response = self._generate_response(response_type, data, entities)
+        rendered = {
+            'response': response,
+            'category': self.knowledge_base.get(response_type, {}).get('category', 'general'),
+            'title': self.knowledge_base.get(response_type, {}).get('title', 'Information'),
+            'data_summary': self._create_data_summary(data),
+            'suggested_followups': self._get_followup_questions(response_type, entities),
+            'data_available': any(k in data for k in ['health_stats', 'condition_stats', 'state_stats',
+                                                      'city_stats', 'correlations']),
+            'word_count': len(response.split()),
+            'cached': False
+        }
+        
+        key = self._render_key(response_type, entities)
+        if key is not None and 'error' not in data:
+            self.rendered_cache.put(version, key, rendered)
+        return rendered
+    
+    def _plan_question(self, question, session_id=None, context=None):
+        """Analyze, record, extract entities and route one question"""
         
         # Analyze question sophistication
         question_analysis = self._analyze_question_sophistication(question)
         
         # Store conversation history
         if session_id:
-            if session_id not in self.conversation_history:
-                self.conversation_history[session_id] = []
-            
-            self.conversation_history[session_id].append({
+            self.conversation_history.append(session_id, {
                 'question': question,
                 'question_analysis': question_analysis,
                 'timestamp': datetime.now().isoformat(),
                 'context': context or []
             })
-            
-            # Keep only last 10 conversations per session
-            if len(self.conversation_history[session_id]) > 10:
-                self.conversation_history[session_id] = self.conversation_history[session_id][-10:]
         
         # Extract entities
         entities = self._extract_entities(question)
         
         # Determine response type
-        response_type = self._determine_response_type(question, entities)
-        
-        # Fetch relevant data
-        data = self._fetch_data_for_response(entities, response_type)
+        response_type, match_score = self._determine_response_type(question, entities)
         
-        # Generate response
-        response = self._generate_response(response_type, data, entities, question_analysis)
-        
-        # Prepare response package
-        response_data = {
-            'success': True,
-            'response': response,
-            'category': self.knowledge_base.get(response_type, {}).get('category', 'general'),
-            'title': self.knowledge_base.get(response_type, {}).get('title', 'Information'),
+        return {
+            'question_analysis': question_analysis,
             'entities': entities,
-            'data_summary': self._create_data_summary(data),
-            'suggested_followups': self._get_followup_questions(response_type, entities),
+            'response_type': response_type,
+            'match_score': match_score
+        }
+    
+    def _package_response(self, plan, rendered):
+        """Prepare response package"""
+        return {
+            'success': True,
+            'response': rendered['response'],
+            'category': rendered['category'],
+            'title': rendered['title'],
+            'entities': plan['entities'],
+            'data_summary': rendered['data_summary'],
+            'suggested_followups': rendered['suggested_followups'],
+            'data_available': rendered['data_available'],
             'metadata': {
-                'word_count': len(response.split()),
-                'estimated_reading_time': math.ceil(len(response.split()) / 200),
-                'question_complexity': question_analysis['complexity_score'],
-                'response_type': response_type,
+                'word_count': rendered['word_count'],
+                'estimated_reading_time': math.ceil(rendered['word_count'] / 200),
+                'question_complexity': plan['question_analysis']['complexity_score'],
+                'response_type': plan['response_type'],
+                'match_score': plan['match_score'],
+                'cached': rendered['cached'],
                 'timestamp': datetime.now().isoformat()
             }
         }
+    
+    def get_response(self, question, session_id=None, context=None):
+        """Main method to get AI-enhanced response"""
+        plan = self._plan_question(question, session_id, context)
         
-        # Add data availability flag
-        if 'health_stats' in data or 'condition_stats' in data or 'state_stats' in data:
-            response_data['data_available'] = True
-        else:
-            response_data['data_available'] = False
+        # Fetch data and render, or reuse an identical earlier answer
+        rendered = self._render_response(plan['response_type'], plan['entities'])
+        
+        return self._package_response(plan, rendered)
+    
+    def stream_response(self, question, session_id=None, context=None):
+        """Yield (event, payload) pairs for one question as they become available
+        
+        The routing decision goes out before any data is fetched, then one
+        progress event per data fetch, the answer one section at a time and
+        finally the same package get_response returns.
+        """
+        plan = self._plan_question(question, session_id, context)
+        yield 'meta', {
+            'entities': plan['entities'],
+            'response_type': plan['response_type'],
+            'match_score': plan['match_score'],
+            'category': self.knowledge_base.get(plan['response_type'], {}).get('category', 'general'),
+            'title': self.knowledge_base.get(plan['response_type'], {}).get('title', 'Information')
+        }
         
-        return response_data
+        rendered = self._cached_render(plan['response_type'], plan['entities'])
+        if rendered is None:
+            requirements = self._data_requirements(plan['entities'], plan['response_type'])
+            fetched = {}
+            for done, ((helper, args), value) in enumerate(self._iter_fetches(requirements), 1):
+                fetched[(helper, args)] = value
+                yield 'progress', {'fetch': helper.__name__, 'done': done, 'total': len(requirements),
+                                   'timed_out': value is FETCH_TIMED_OUT}
+            rendered = self._render_response(plan['response_type'], plan['entities'], fetched)
+        
+        for section in rendered['response'].split('\n\n'):
+            if section.strip():
+                yield 'section', {'text': section}
+        
+        yield 'done', self._package_response(plan, rendered)
+    
+    def get_responses(self, questions, session_id=None, context=None):
+        """Answer many questions, fetching each distinct piece of data once
+        
+        Returns the response packages in question order and the number of
+        distinct helper calls the batch needed.
+        """
+        plans = [self._plan_question(q, session_id, context) for q in questions]
+        
+        # Union of the data every uncached answer needs
+        requirements = []
+        for plan in plans:
+            if self._cached_render(plan['response_type'], plan['entities']) is None:
+                requirements += self._data_requirements(plan['entities'], plan['response_type'])
+        requirements = list(dict.fromkeys(requirements))
+        
+        try:
+            fetched = self._fetch_all(requirements)
+        except Exception as e:
+            print(f"Batch data fetch error: {e}")
+            fetched = {}
+        
+        responses = [
+            self._package_response(plan, self._render_response(plan['response_type'],
+                                                               plan['entities'], fetched))
+            for plan in plans
+        ]
+        return responses, len(requirements)
 
 # Initialize chatbot
 enhanced_chatbot = AIHealthAnalyticsChatbot()
@@ -1236,6 +1557,58 @@ enhanced_chatbot = AIHealthAnalyticsChatbot()
 # API Endpoints
 ##################################################
 
+BATCH_MAX_QUESTIONS = int(os.environ.get('CHAT_BATCH_MAX_QUESTIONS', '100'))
+
+def empty_question_response():
+    """Reply for a blank question"""
+    return {
+        'success': False,
+        'response': 'Please ask a question about our health analytics project. For example: "What is this project about?" or "Tell me about cancer search patterns."'
+    }
+
+def add_suggested_questions(response_data):
+    """Convert followups to suggested questions format"""
+    followups = response_data.get('suggested_followups', [])
+    response_data['suggested_questions'] = [
+        {"category": "followup", "question": q} for q in followups[:4]
+    ]
+    
+    # Add general suggestions if no specific followups
+    if not followups:
+        response_data['suggested_questions'] = [
+            {"category": "general", "question": "What are the key findings?"},
+            {"category": "general", "question": "Explain the methodology"},
+            {"category": "general", "question": "Show me health conditions list"},
+            {"category": "general", "question": "Who worked on this project?"}
+        ]
+    return response_data
+
+def sse_event(event, payload):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {app.json.dumps(payload)}\n\n"
+
+def stream_chat(question, session_id, context):
+    """Server-Sent Events variant of /api/chat"""
+    def events():
+        try:
+            for event, payload in enhanced_chatbot.stream_response(question, session_id, context):
+                if event == 'done':
+                    payload = add_suggested_questions(payload)
+                yield sse_event(event, payload)
+        except Exception as e:
+            print(f"Chatbot stream error: {e}")
+            traceback.print_exc()
+            yield sse_event('error', {
+                'success': False,
+                'response': 'I apologize, but I encountered an issue processing your question. Please try rephrasing or ask about a different topic.'
+            })
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/chat', methods=['POST'])
 def chat_endpoint():
     """Main chatbot API endpoint"""
@@ -1246,30 +1619,16 @@ def chat_endpoint():
         context = data.get('context', [])
         
         if not question:
-            return jsonify({
-                'success': False,
-                'response': 'Please ask a question about our health analytics project. For example: "What is this project about?" or "Tell me about cancer search patterns."'
-            })
+            return jsonify(empty_question_response())
+        
+        # Stream the answer as Server-Sent Events when asked to
+        if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+            return stream_chat(question, session_id, context)
         
         # Get response from chatbot
         response_data = enhanced_chatbot.get_response(question, session_id, context)
         
-        # Convert followups to suggested questions format
-        followups = response_data.get('suggested_followups', [])
-        response_data['suggested_questions'] = [
-            {"category": "followup", "question": q} for q in followups[:4]
-        ]
-        
-        # Add general suggestions if no specific followups
-        if not followups:
-            response_data['suggested_questions'] = [
-                {"category": "general", "question": "What are the key findings?"},
-                {"category": "general", "question": "Explain the methodology"},
-                {"category": "general", "question": "Show me health conditions list"},
-                {"category": "general", "question": "Who worked on this project?"}
-            ]
-        
-        return jsonify(response_data)
+        return jsonify(add_suggested_questions(response_data))
         
     except Exception as e:
         print(f"Chatbot error: {e}")
@@ -1285,7 +1644,42 @@ def chat_endpoint():
             ]
         })
 
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch_endpoint():
+    """Answer a list of questions in one call, fetching shared data once"""
+    data = request.get_json(silent=True) or {}
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+        return jsonify({'success': False, 'message': 'questions must be a list of strings'}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({'success': False,
+                        'message': f'At most {BATCH_MAX_QUESTIONS} questions per batch'}), 400
+    
+    try:
+        questions = [q.strip() for q in questions]
+        asked = [q for q in questions if q]
+        answers, distinct_fetches = enhanced_chatbot.get_responses(
+            asked, data.get('session_id'), data.get('context', []))
+        
+        answers = iter(answers)
+        responses = [add_suggested_questions(next(answers)) if q else empty_question_response()
+                     for q in questions]
+        return jsonify({
+            'success': True,
+            'count': len(responses),
+            'distinct_fetches': distinct_fetches,
+            'responses': responses
+        })
+    except Exception as e:
+        print(f"Chatbot batch error: {e}")
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'message': 'I apologize, but I encountered an issue processing this batch of questions.'
+        }), 500
+
 @app.route('/api/chat/conditions', methods=['GET'])
+@data_route
 def get_conditions():
     """Get list of health conditions"""
     try:
@@ -1302,9 +1696,10 @@ def get_conditions():
         return jsonify({
             'success': False,
             'message': f'Error: {str(e)}'
-        })
+        }), 500
 
 @app.route('/api/chat/team', methods=['GET'])
+@data_route
 def get_team():
     """Get team information"""
     try:
@@ -1320,13 +1715,20 @@ def get_team():
         return jsonify({
             'success': False,
             'message': f'Error: {str(e)}'
-        })
+        }), 500
 
 @app.route('/api/chat/stats', methods=['GET'])
+@data_route
 def get_project_stats():
     """Get project statistics"""
     try:
         condition_stats = get_health_condition_stats()
+        if not condition_stats:
+            # The helper returns {} when its query fails
+            return jsonify({
+                'success': False,
+                'message': 'Search statistics are unavailable right now'
+            }), 503
         
         return jsonify({
             'success': True,
@@ -1339,7 +1741,69 @@ def get_project_stats():
         return jsonify({
             'success': False,
             'message': f'Error: {str(e)}'
-        })
+        }), 500
+
+@app.route('/api/correlation', methods=['GET'])
+@data_route
+def correlation_matrix():
+    """Condition correlation matrix, overall or for ?state= or ?year="""
+    state = request.args.get('state') or None
+    year = request.args.get('year') or None
+    if state and year:
+        return jsonify({'success': False, 'message': 'Pass state or year, not both'}), 400
+    if year and not year.isdigit():
+        return jsonify({'success': False, 'message': 'year must be a number'}), 400
+    
+    matrix = get_correlation_matrix(state, year)
+    if not matrix:
+        return jsonify({'success': False, 'message': 'No correlation data for this selection'}), 404
+    return jsonify({'success': True, 'state': state, 'year': int(year) if year else None, **matrix})
+
+@app.route('/api/query', methods=['GET'])
+@data_route
+def olap_query():
+    """Searches summed by any dimensions, e.g. ?dimensions=state,year&measures=cancer&order=-cancer"""
+    try:
+        query = parse_olap_query(request.args)
+    except QueryParamError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    try:
+        source, df = run_olap_query(engine, query)
+    except Exception as e:
+        print(f"Error in olap_query: {e}")
+        return jsonify({'success': False, 'message': 'Query failed'}), 500
+    
+    return jsonify({
+        'success': True,
+        'source': source,
+        'dimensions': query['dimensions'],
+        'measures': query['measures'],
+        'count': len(df),
+        'rows': df.to_dict('records')
+    })
+
+@app.route('/api/top-states', methods=['GET'])
+@data_route
+def top_states():
+    """Most searched states for every condition, or ?condition=, overall or for ?year="""
+    condition = (request.args.get('condition') or '').lower() or None
+    year = request.args.get('year') or None
+    k = request.args.get('k', '5')
+    if condition and condition not in QUERY_MEASURES:
+        return jsonify({'success': False, 'message': f"Unknown condition: {condition}. "
+                                                     f"Available: {', '.join(QUERY_MEASURES)}"}), 400
+    if year and not year.isdigit():
+        return jsonify({'success': False, 'message': 'year must be a number'}), 400
+    if not k.isdigit() or not 1 <= int(k) <= TOP_STATES_K:
+        return jsonify({'success': False, 'message': f'k must be between 1 and {TOP_STATES_K}'}), 400
+    
+    conditions = [condition] if condition else QUERY_MEASURES
+    ranked = {c: get_top_states_for_condition(c, year, int(k)) for c in conditions}
+    if not any(ranked.values()):
+        return jsonify({'success': False, 'message': 'No search data for this selection'}), 404
+    return jsonify({'success': True, 'year': int(year) if year else None, 'k': int(k),
+                    'top_states': ranked})
 
 #################################################
 # Existing Routes (Maintained for compatibility)
@@ -1354,32 +1818,16 @@ def home():
     return render_template("index.html")
 
 @app.route('/searchbyyear')
+@data_route
 def searchbyyear():
-    sqlStatement = """
-   SELECT year, SUM ("Cancer" + "cardiovascular" + "stroke" + "depression" + "rehab" + "vaccine" + "diarrhea" + "obesity" + "diabetes") AS Searches  
-   FROM search_condition 
-   GROUP BY year
-    ORDER BY year;
-    """
-    df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('year', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    df = query_aggregate('searchbyyear')
+    return table_response(df, 'year')
 
 @app.route('/searchyearandcondition')
+@data_route
 def searchyearandcondition():
-    sqlStatement = """
-    SELECT year, SUM ("Cancer") AS Cancer,SUM ("cardiovascular") As Cardiovascular,SUM ("stroke") As Stroke,SUM ("depression") As Depression,SUM ("rehab") AS Rehab,SUM ("vaccine") AS Vaccine, SUM ("diarrhea") AS Diarrhea, SUM("obesity") AS Obesity, SUM ("diabetes") AS Diabetes    
-    FROM search_condition 
-    GROUP BY year
-    ORDER BY year;
-    """
-    df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('year', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    df = query_aggregate('searchyearandcondition')
+    return table_response(df, 'year')
 
 @app.route("/dashboards/main")
 def main_dashboard():
@@ -1394,62 +1842,39 @@ def about_page():
     return render_template("about.html")
 
 @app.route('/searchbycity')
+@data_route
 def searchbycity():
-    sqlStatement = """
-SELECT l.city,l.postal,l.state, l.latitude, l.longitude, SUM (s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes") AS Searches  
-FROM location l
-INNER JOIN search_condition s on s.location_id = l.location_id
-GROUP BY l.city,l.state,l.postal, l.latitude, l.longitude
-ORDER BY l.city;
-    """
-    df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('city', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    df = query_aggregate('searchbycity')
+    return table_response(df, 'city')
 
 @app.route('/searchbystate')
+@data_route
 def searchbystate():
-    sqlStatement = """
-SELECT l.state,l.postal, SUM (s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes") AS Searches  
-FROM location l
-INNER JOIN search_condition s on s.location_id = l.location_id
-GROUP BY l.state,l.postal;
- """
-    df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('state', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    df = query_aggregate('searchbystate')
+    return table_response(df, 'state')
 
 @app.route('/bystateandyear')
+@data_route
 def bylocationandyear():
-    sqlStatement = """
- SELECT l.state, l.latitude, l.longitude,s.year, SUM (s."Cancer" + s."cardiovascular" + s."stroke" + s."depression" + s."rehab" + s."vaccine" + s."diarrhea" + s."obesity" + s."diabetes") AS Searches  
-FROM location l
-INNER JOIN search_condition s on s.location_id = l.location_id
-GROUP BY l.state, l.latitude, l.longitude, s.year
-ORDER BY s.year;
-    """
-    df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('state', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    df = query_aggregate('bystateandyear')
+    return table_response(df, 'state')
 
 @app.route('/casesleadingdeath')
+@data_route
 def casesleadingdeath():
+    if is_table_query('casesleadingdeath', request.args):
+        return table_page('casesleadingdeath')
     sqlStatement = """
     SELECT * FROM leading_causes_of_death;
     """
     df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('year', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    return table_response(df, 'year')
 
 @app.route('/allsearchrecord')
+@data_route
 def allsearchrecord():
+    if is_table_query('allsearchrecord', request.args):
+        return table_page('allsearchrecord')
     sqlStatement = """
     SELECT *
     FROM location l
@@ -1457,60 +1882,67 @@ def allsearchrecord():
     ORDER BY s.year;
     """
     df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('year', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    return table_response(df, 'year')
 
 @app.route('/location')
+@data_route
 def location():
+    if is_table_query('location', request.args):
+        return table_page('location')
     sqlStatement = """
     SELECT * FROM location;
     """
     df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('location_id', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    return table_response(df, 'location_id')
 
 @app.route('/conditions')
+@data_route
 def conditions():
+    if is_table_query('conditions', request.args):
+        return table_page('conditions')
     sqlStatement = """
     SELECT * FROM search_condition;
     """
     df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('location_id', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    return table_response(df, 'location_id')
 
 @app.route('/mostsserached')
+@data_route
 def mostsserached():
-    sqlStatement = """
-    SELECT l.state, SUM ("Cancer") AS Cancer,SUM ("cardiovascular") As Cardiovascular,SUM ("stroke") As Stroke,SUM ("depression") As Depression,SUM ("rehab") AS Rehab,SUM ("vaccine") AS Vaccine, SUM ("diarrhea") AS Diarrhea, SUM("obesity") AS Obesity, SUM ("diabetes") AS Diabetes 
-    FROM location l
-    INNER JOIN search_condition s on s.location_id = l.location_id
-    GROUP BY state
-    order by Cancer desc, Cardiovascular desc,Stroke desc,Depression desc,Rehab desc,Vaccine desc, Diarrhea desc, Diabetes desc, Obesity desc
-    LIMIT 10; 
-    """
-    df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('state', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    df = query_aggregate('mostsserached')
+    return table_response(df, 'state')
 
 @app.route('/totalcondition')
+@data_route
 def totalcondition():
-    sqlStatement = """
-    SELECT SUM ("Cancer") AS Cancer,SUM ("cardiovascular") As Cardiovascular,SUM ("stroke") As Stroke,SUM ("depression") As Depression,SUM ("rehab") AS Rehab,SUM ("vaccine") AS Vaccine, SUM ("diarrhea") AS Diarrhea, SUM("obesity") AS Obesity, SUM ("diabetes") AS Diabetes    
-    FROM search_condition 
-    """
-    df = pdsql.read_sql(sqlStatement, engine)
-    df.set_index('cancer', inplace=True)
-    df = df.to_json(orient='table')
-    result = json.loads(df)
-    return jsonify(result)
+    df = query_aggregate('totalcondition')
+    return table_response(df, 'cancer')
+
+@app.route('/export/<name>')
+@data_route
+def export(name):
+    """Stream any data route as CSV or NDJSON, honouring the table route filters"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False,
+                        'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    if name in TABLE_ROUTES:
+        try:
+            query = parse_table_query(name, request.args)
+        except QueryParamError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        sql, params = build_table_query(name, **query)
+        chunks = stream_query(engine, sql, params)
+    elif name in AGGREGATE_SQL:
+        chunks = stream_frame(query_aggregate(name))
+    else:
+        abort(404)
+
+    filename = re.sub(r'[^A-Za-z0-9_-]', '', request.args.get('filename', '')) or name
+    response = Response(ENCODERS[export_format](chunks), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
 
 #if __name__ == '__main__':
 #    app.run(debug=True, port=5000)
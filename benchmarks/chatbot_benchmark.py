@@ -0,0 +1,368 @@
+# chatbot_benchmark.py - per-stage latency and allocations of the chatbot
+#
+#   python benchmarks/chatbot_benchmark.py [--repeat 20] [--warm]
+#   python benchmarks/chatbot_benchmark.py --save-baseline benchmarks/chatbot_baseline.json
+#   python benchmarks/chatbot_benchmark.py --compare [PATH]
+#
+# Replays a question corpus that covers every response type through
+# AIHealthAnalyticsChatbot.get_response and the /api/chat endpoint, against a
+# SQLite copy of the CSVs in Data/database/load_in_to_db (built on first use).
+# Caches are cleared before every question unless --warm is given, so each
+# stage does its full work. A comparison run exits with status 1 when a stage
+# is slower or allocates more than the baseline allows. --compare defaults to
+# the committed chatbot_baseline.json, which records the machine and Python
+# it was measured on; timings do not travel between machines, so save a
+# baseline on yours first and compare against that.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LOAD_DIR = os.path.join(ROOT, 'Data', 'database', 'load_in_to_db')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, LOAD_DIR)
+
+DEFAULT_FIXTURE = os.path.join(tempfile.gettempdir(), 'health_benchmark.sqlite3')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot_baseline.json')
+
+# (response type the question should be routed to, question)
+QUESTIONS = [
+    ('greeting', "Hello there"),
+    ('farewell', "Goodbye, see you"),
+    ('thanks', "Thank you so much"),
+    ('help', "What can you do?"),
+    ('project_overview', "What is this project about?"),
+    ('data_sources', "Where does the data come from? Google Trends or CDC?"),
+    ('health_conditions', "Which medical conditions were analyzed?"),
+    ('specific_condition', "Tell me about cancer search patterns"),
+    ('specific_condition', "How did diabetes searches change?"),
+    ('specific_condition', "Show me obesity searches in Texas"),
+    ('methodology', "Explain the methodology"),
+    ('key_findings', "What are the key findings?"),
+    ('state_analysis', "What does the data say about California?"),
+    ('city_analysis', "Show me city data for the metropolitan areas"),
+    ('team_members', "Who worked on this project team?"),
+    ('specific_member', "Tell me about Ermias"),
+    ('correlation_analysis', "Is there a correlation or relationship between them?"),
+    ('time_series', "Show the historical timeline"),
+    ('geographic_analysis', "Show me the geographic map"),
+    ('metrics_insights', "Give me some statistics"),
+]
+
+STAGES = ['sophistication', 'entities', 'routing', 'fetch', 'render', 'packaging']
+
+# Chatbot method -> the stage its time and allocations count towards
+STAGE_METHODS = {
+    '_analyze_question_sophistication': 'sophistication',
+    '_extract_entities': 'entities',
+    '_determine_response_type': 'routing',
+    '_fetch_data_for_response': 'fetch',
+    '_generate_response': 'render',
+    '_create_data_summary': 'render',
+    '_get_followup_questions': 'render',
+    '_package_response': 'packaging',
+}
+
+# A stage regresses when it exceeds the baseline by the tolerance plus these floors
+TIME_FLOOR_MS = 0.05
+ALLOC_FLOOR_KIB = 16.0
+
+#################################################
+# Fixture Database
+##################################################
+
+def build_fixture(path):
+    """SQLite copy of the load_in_to_db CSVs, with rollups and a dataset version"""
+    import pandas as pd
+    from sqlalchemy import create_engine
+    from refresh_rollups import refresh_rollups
+
+    print(f"Building fixture database {path}")
+    if os.path.exists(path):
+        os.remove(path)
+    with sqlite3.connect(path) as conn:
+        for table in ['location', 'search_condition', 'leading_causes_of_death']:
+            frame = pd.read_csv(os.path.join(LOAD_DIR, f'{table}.csv'), encoding='utf-8-sig')
+            frame.to_sql(table, conn, index=False)
+        conn.execute("CREATE TABLE dataset_version (version INTEGER NOT NULL, "
+                     "loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+        conn.execute("INSERT INTO dataset_version (version) VALUES (1)")
+
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn, contextlib.redirect_stdout(io.StringIO()):
+        refresh_rollups(conn)
+    engine.dispose()
+
+#################################################
+# Stage Recording
+##################################################
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class StageRecorder:
+    """Wraps the chatbot's stage methods to time them and, optionally, trace allocations
+
+    The wrapped methods never call one another, so each stage's numbers
+    are its own. Per question, a stage's calls are added together.
+    """
+
+    def __init__(self, chatbot):
+        self.chatbot = chatbot
+        self.trace = False
+        self.current = None
+        # Highest traced memory seen by a stage; a stage resets the tracemalloc
+        # peak, so the caller's own peak has to take this into account
+        self.peak = 0
+
+    def _wrap(self, stage, method):
+        def wrapper(*args, **kwargs):
+            if self.trace:
+                start_bytes, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                seconds, allocated = self.current.get(stage, (0.0, 0))
+                if self.trace:
+                    _, peak = tracemalloc.get_traced_memory()
+                    allocated += max(0, peak - start_bytes)
+                    self.peak = max(self.peak, peak)
+                self.current[stage] = (seconds + elapsed, allocated)
+        return wrapper
+
+    @contextlib.contextmanager
+    def installed(self):
+        for name, stage in STAGE_METHODS.items():
+            setattr(self.chatbot, name, self._wrap(stage, getattr(self.chatbot, name)))
+        try:
+            yield self
+        finally:
+            for name in STAGE_METHODS:
+                delattr(self.chatbot, name)
+
+    def question(self):
+        """Start collecting a fresh set of per-stage numbers and return it"""
+        self.current = {}
+        self.peak = 0
+        return self.current
+
+#################################################
+# Benchmark
+##################################################
+
+def run(repeat, warm, fixture):
+    if not os.path.exists(fixture):
+        build_fixture(fixture)
+    os.environ['DATABASE_URL'] = f'sqlite:///{fixture}'
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as health_app
+    chatbot = health_app.enhanced_chatbot
+    client = health_app.app.test_client()
+
+    def reset_caches():
+        if not warm:
+            health_app.analytics_cache.clear()
+            health_app.rendered_cache.clear()
+
+    # Warm up the snapshot, the entity matcher and the routing check
+    routed = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for expected, question in QUESTIONS:
+            routed[question] = chatbot.get_response(question)['metadata']['response_type']
+    for expected, question in QUESTIONS:
+        if routed[question] != expected:
+            print(f"warning: {question!r} routed to {routed[question]}, expected {expected}")
+    missing = (set(chatbot.knowledge_base) | {'metrics_insights'}) - set(routed.values())
+    if missing:
+        print(f"warning: corpus does not reach {', '.join(sorted(missing))}")
+
+    recorder = StageRecorder(chatbot)
+    times = {stage: [] for stage in STAGES + ['get_response', 'chat_endpoint']}
+    allocations = {stage: [] for stage in STAGES + ['get_response', 'chat_endpoint']}
+    by_type = {}
+
+    with recorder.installed(), contextlib.redirect_stdout(io.StringIO()):
+        # Latency, without tracing
+        for _ in range(repeat):
+            for expected, question in QUESTIONS:
+                reset_caches()
+                stages = recorder.question()
+                started = time.perf_counter()
+                chatbot.get_response(question)
+                elapsed = time.perf_counter() - started
+                times['get_response'].append(elapsed * 1000)
+                by_type.setdefault(routed[question], []).append(elapsed * 1000)
+                for stage, (seconds, _) in stages.items():
+                    times[stage].append(seconds * 1000)
+
+        # Allocations, one traced pass
+        recorder.trace = True
+        tracemalloc.start()
+        for expected, question in QUESTIONS:
+            reset_caches()
+            stages = recorder.question()
+            start_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            chatbot.get_response(question)
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, recorder.peak)
+            allocations['get_response'].append((peak - start_bytes) / 1024)
+            for stage, (_, allocated) in stages.items():
+                allocations[stage].append(allocated / 1024)
+        tracemalloc.stop()
+        recorder.trace = False
+
+    # The endpoint adds JSON parsing, suggested questions and serialization
+    with contextlib.redirect_stdout(io.StringIO()):
+        for traced in [False] * repeat + [True]:
+            if traced:
+                tracemalloc.start()
+            for expected, question in QUESTIONS:
+                reset_caches()
+                start_bytes = tracemalloc.get_traced_memory()[0] if traced else 0
+                if traced:
+                    tracemalloc.reset_peak()
+                started = time.perf_counter()
+                client.post('/api/chat', json={'question': question, 'session_id': 'benchmark'})
+                elapsed = time.perf_counter() - started
+                if traced:
+                    allocations['chat_endpoint'].append(
+                        (tracemalloc.get_traced_memory()[1] - start_bytes) / 1024)
+                else:
+                    times['chat_endpoint'].append(elapsed * 1000)
+            if traced:
+                tracemalloc.stop()
+
+    return {
+        'config': {'repeat': repeat, 'warm': warm, 'questions': len(QUESTIONS),
+                   'python': platform.python_version(), 'machine': machine()},
+        'stages': {stage: summarize(times[stage], allocations[stage]) for stage in times},
+        'response_types': {name: {'p50_ms': percentile(samples, 0.5),
+                                  'p95_ms': percentile(samples, 0.95)}
+                           for name, samples in sorted(by_type.items())}
+    }
+
+
+def machine():
+    """Where the numbers were measured, so a baseline from elsewhere can be told apart"""
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+
+def summarize(samples, allocated):
+    if not samples:
+        return {'calls': 0}
+    return {
+        'calls': len(samples),
+        'p50_ms': percentile(samples, 0.5),
+        'p95_ms': percentile(samples, 0.95),
+        'p99_ms': percentile(samples, 0.99),
+        'alloc_kib_mean': sum(allocated) / len(allocated) if allocated else 0.0,
+        'alloc_kib_max': max(allocated) if allocated else 0.0
+    }
+
+
+def report(results):
+    config = results['config']
+    print(f"{config['questions']} questions x {config['repeat']} "
+          f"({'warm' if config['warm'] else 'cold'} caches), Python {config['python']}")
+    if config.get('machine'):
+        print(f"{config['machine']['platform']}, {config['machine']['processor']}, "
+              f"{config['machine']['cpus']} CPUs")
+    print(f"{'stage':<16}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'alloc KiB':>12}{'max KiB':>10}")
+    for stage, stats in results['stages'].items():
+        if not stats['calls']:
+            print(f"{stage:<16}{0:>7}")
+            continue
+        print(f"{stage:<16}{stats['calls']:>7}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+              f"{stats['p99_ms']:>10.3f}{stats['alloc_kib_mean']:>12.1f}{stats['alloc_kib_max']:>10.1f}")
+    print()
+    print(f"{'response type':<24}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, stats in results['response_types'].items():
+        print(f"{name:<24}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}")
+
+
+def compare(results, baseline, tolerance):
+    """Descriptions of every stage that regressed against the baseline"""
+    regressions = []
+    for stage, before in baseline['stages'].items():
+        after = results['stages'].get(stage)
+        if not after or not before.get('calls') or not after.get('calls'):
+            continue
+        for key in ['p50_ms', 'p95_ms']:
+            if after[key] > before[key] * (1 + tolerance) + TIME_FLOOR_MS:
+                regressions.append(f"{stage} {key}: {before[key]:.3f} -> {after[key]:.3f}")
+        key = 'alloc_kib_mean'
+        if after[key] > before[key] * (1 + tolerance) + ALLOC_FLOOR_KIB:
+            regressions.append(f"{stage} {key}: {before[key]:.1f} -> {after[key]:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the chatbot pipeline stage by stage')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='passes over the question corpus')
+    parser.add_argument('--warm', action='store_true',
+                        help='keep the analytics and rendered caches between questions')
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE,
+                        help='SQLite fixture database, built from the CSVs if missing')
+    parser.add_argument('--rebuild-fixture', action='store_true',
+                        help='rebuild the fixture database first')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='write the results as a baseline JSON file')
+    parser.add_argument('--compare', metavar='PATH', nargs='?', const=DEFAULT_BASELINE,
+                        help='fail if any stage regressed against this baseline '
+                             '(default: benchmarks/chatbot_baseline.json)')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown or allocation growth as a fraction of the baseline')
+    args = parser.parse_args()
+
+    if args.rebuild_fixture:
+        build_fixture(args.fixture)
+    results = run(args.repeat, args.warm, args.fixture)
+    report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['config'].get('warm') != args.warm:
+            print("\nwarning: baseline and this run used different cache modes")
+        if (baseline['config'].get('machine') != results['config']['machine'] or
+                baseline['config'].get('python') != results['config']['python']):
+            print("\nwarning: baseline was measured on another machine or Python; "
+                  "save one here with --save-baseline before trusting the comparison")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# sentiment_benchmark.py - per-message latency of the chatbot sentiment backends
+#
+#   python benchmarks/sentiment_benchmark.py [--repeat 200]
+#
+# Reports load time, per-message latency and how often each backend's label
+# agrees with TextBlob's. Backends that cannot be loaded are skipped.
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sentiment import SENTIMENT_BACKENDS, sentiment_label
+
+QUESTIONS = [
+    "Hi there!",
+    "What is this project about?",
+    "Tell me about cancer search patterns",
+    "What are the top states for diabetes?",
+    "How has depression search trend changed over time?",
+    "Show me obesity searches in Texas in 2015",
+    "This dashboard is really great, thanks!",
+    "The map is confusing and the colors are terrible",
+    "Not bad at all, very helpful",
+    "Why is the stroke data so hard to read?",
+    "Who worked on this project?",
+    "Tell me about Ermias",
+    "Compare cardiovascular and cancer searches",
+    "What data sources were used?",
+    "Explain the methodology",
+    "Which city searches most for rehab?",
+    "I love the time series view",
+    "Is there a correlation between diabetes and obesity?",
+    "The worst part is the slow loading",
+    "What are the key findings?",
+    "Show me health conditions list",
+    "Vaccine searches in California over the years",
+    "That's not very useful",
+    "How many searches were there in 2010?",
+    "Bye, this was a wonderful tour",
+]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(repeat):
+    results = {}
+    for name, backend in SENTIMENT_BACKENDS.items():
+        started = time.perf_counter()
+        try:
+            scorer = backend()
+        except ImportError as e:
+            print(f"{name:<10} skipped: {e}")
+            continue
+        scorer.polarity(QUESTIONS[0])
+        load_ms = (time.perf_counter() - started) * 1000
+
+        samples = []
+        for _ in range(repeat):
+            for question in QUESTIONS:
+                started = time.perf_counter()
+                scorer.polarity(question)
+                samples.append((time.perf_counter() - started) * 1e6)
+
+        results[name] = [sentiment_label(scorer.polarity(q)) for q in QUESTIONS]
+        print(f"{name:<10} load {load_ms:8.1f} ms   per message: "
+              f"mean {statistics.mean(samples):7.1f} us   p50 {percentile(samples, 0.5):7.1f} us   "
+              f"p95 {percentile(samples, 0.95):7.1f} us")
+
+    if 'textblob' in results:
+        reference = results['textblob']
+        for name, labels in results.items():
+            if name == 'textblob':
+                continue
+            agree = sum(a == b for a, b in zip(labels, reference))
+            print(f"{name:<10} agrees with textblob on {agree}/{len(reference)} questions")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the chatbot sentiment backends')
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='passes over the question corpus per backend')
+    run(parser.parse_args().repeat)
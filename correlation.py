@@ -0,0 +1,151 @@
+# correlation.py - CONDITION CORRELATION MATRICES
+import threading
+
+import numpy as np
+import pandas as pd
+import pandas.io.sql as pdsql
+
+from snapshot import CONDITION_COLUMNS, MEASURES, current_dataset_version, get_snapshot
+
+# Used when the snapshot is disabled; rows without a location still count overall
+CORRELATION_SQL = """
+SELECT l.state, s.year, s."Cancer", s."cardiovascular", s."stroke", s."depression",
+       s."rehab", s."vaccine", s."diarrhea", s."obesity", s."diabetes"
+FROM search_condition s
+LEFT JOIN location l ON s.location_id = l.location_id
+"""
+
+#################################################
+# Vectorized Pearson Matrices
+##################################################
+
+def grouped_correlations(values, codes, groups):
+    """(counts, matrices) of Pearson correlations between the columns of values
+
+    values is a (rows, k) array and codes gives each row's group in
+    [0, groups), or -1 to leave it out. Rows are sorted by group once and
+    each group's sums and k x k cross products are accumulated from its
+    contiguous slice with one matrix product, so extra memory stays at
+    O(rows x k) however many column pairs there are. Coefficients
+    involving a constant column are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    keep = codes >= 0
+    values, codes = values[keep], codes[keep]
+    k = values.shape[1]
+
+    counts = np.bincount(codes, minlength=groups)
+    sums = np.zeros((groups, k))
+    products = np.zeros((groups, k, k))
+    if len(codes):
+        order = np.argsort(codes, kind='stable')
+        values, codes = values[order], codes[order]
+        present, starts = np.unique(codes, return_index=True)
+        sums[present] = np.add.reduceat(values, starts)
+        for group, start, end in zip(present, starts, np.append(starts[1:], len(codes))):
+            block = values[start:end]
+            products[group] = block.T @ block
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = counts[:, None, None].astype(np.float64)
+        # n^2 times the covariance, so the scale cancels out below
+        scatter = n * products - sums[:, :, None] * sums[:, None, :]
+        variance = np.diagonal(scatter, axis1=1, axis2=2)
+        matrices = scatter / np.sqrt(variance[:, :, None] * variance[:, None, :])
+    matrices = np.where(np.abs(matrices) <= 1.0, matrices, np.sign(matrices))
+    return counts, matrices
+
+
+class ConditionCorrelations:
+    """Correlation matrices of the nine conditions, overall, per state and per year
+
+    All three are computed up front for one dataset version, so serving a
+    matrix or one coefficient is a lookup.
+    """
+
+    def __init__(self, values, states, years, version=None):
+        self.version = version
+        self.conditions = list(MEASURES)
+
+        codes = np.zeros(len(values), dtype=np.intp)
+        counts, matrices = grouped_correlations(values, codes, 1)
+        self.overall = (int(counts[0]), matrices[0])
+
+        codes, self.states = pd.factorize(pd.Series(states, dtype=object), sort=True)
+        counts, matrices = grouped_correlations(values, codes, len(self.states))
+        self.by_state = {state: (int(c), m) for state, c, m in zip(self.states, counts, matrices)}
+
+        codes, self.years = pd.factorize(pd.Series(years), sort=True)
+        counts, matrices = grouped_correlations(values, codes, len(self.years))
+        self.by_year = {int(year): (int(c), m) for year, c, m in zip(self.years, counts, matrices)}
+
+    def scope(self, state=None, year=None):
+        """(rows, matrix) for all data, one state or one year; None if unknown"""
+        if state is not None and year is not None:
+            raise ValueError("Correlations are kept per state or per year, not both")
+        if state is not None:
+            return self.by_state.get(state)
+        if year is not None:
+            return self.by_year.get(int(year))
+        return self.overall
+
+    def coefficient(self, condition1, condition2, state=None, year=None):
+        """Pearson r between two conditions, or None when it is undefined"""
+        scope = self.scope(state, year)
+        if scope is None:
+            return None
+        i = self.conditions.index(condition1.lower())
+        j = self.conditions.index(condition2.lower())
+        value = scope[1][i, j]
+        return None if np.isnan(value) else float(value)
+
+    def to_dict(self, state=None, year=None):
+        """JSON-ready matrix for a scope, with undefined coefficients as None"""
+        scope = self.scope(state, year)
+        if scope is None:
+            return None
+        rows, matrix = scope
+        return {
+            'conditions': self.conditions,
+            'rows': rows,
+            'matrix': [[None if np.isnan(v) else round(float(v), 4) for v in row]
+                       for row in matrix]
+        }
+
+#################################################
+# Per-Worker Correlation Management
+##################################################
+
+_lock = threading.Lock()
+_correlations = None
+
+def _load_columns(engine):
+    """(values, states, years) per search row, from the snapshot when there is one"""
+    snapshot = get_snapshot(engine)
+    if snapshot is not None:
+        values = np.column_stack([snapshot.counts[m] for m in MEASURES])
+        located = snapshot.location_codes >= 0
+        states = np.full(len(snapshot), None, dtype=object)
+        states[located] = snapshot.locations['state'].to_numpy(object)[snapshot.location_codes[located]]
+        return values, states, snapshot.years
+
+    df = pdsql.read_sql(CORRELATION_SQL, engine)
+    values = df[CONDITION_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy()
+    years = pd.to_numeric(df['year'], errors='coerce').fillna(0).astype(int).to_numpy()
+    return values, df['state'].to_numpy(object), years
+
+def get_correlations(engine):
+    """Return this worker's correlations, recomputing them when the dataset version changes"""
+    global _correlations
+    version, _ = current_dataset_version(engine)
+    correlations = _correlations
+    if correlations is not None and correlations.version == version:
+        return correlations
+
+    with _lock:
+        if _correlations is None or _correlations.version != version:
+            try:
+                _correlations = ConditionCorrelations(*_load_columns(engine), version=version)
+            except Exception as e:
+                print(f"Error computing condition correlations: {e}")
+        return _correlations
@@ -0,0 +1,502 @@
+# entity_matcher.py - ONE-PASS ENTITY EXTRACTION FOR THE CHATBOT
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from importlib.util import find_spec
+
+import pandas.io.sql as pdsql
+
+from snapshot import current_dataset_version, get_snapshot
+
+#################################################
+# Vocabularies
+##################################################
+
+# Later intents win when a question contains several
+INTENT_TERMS = {
+    'greeting': ['hi', 'hello', 'hey', 'greetings'],
+    'thanks': ['thanks', 'thank', 'appreciate', 'appreciated'],
+    'farewell': ['bye', 'goodbye', 'see you', 'farewell'],
+    'help': ['help', 'what can']
+}
+INTENT_PRIORITY = ['greeting', 'thanks', 'farewell', 'help']
+
+# Canonical condition -> the phrases that mean it, most specific first
+CONDITION_TERMS = {
+    'cancer': ['cancer', 'cancers', 'tumor', 'tumors', 'malignancy', 'oncology'],
+    'diabetes': ['diabetes', 'diabetic', 'blood sugar'],
+    'depression': ['depression'],
+    'obesity': ['obesity', 'overweight'],
+    'cardiovascular': ['cardiovascular', 'heart', 'cardiac'],
+    'stroke': ['stroke', 'strokes', 'brain attack'],
+    'vaccine': ['vaccine', 'vaccines', 'vaccination', 'vaccinations', 'immunization'],
+    'rehab': ['rehab', 'rehabilitation'],
+    'diarrhea': ['diarrhea', 'gastrointestinal']
+}
+
+US_STATES = [
+    'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado', 'Connecticut',
+    'Delaware', 'District of Columbia', 'Florida', 'Georgia', 'Hawaii', 'Idaho', 'Illinois',
+    'Indiana', 'Iowa', 'Kansas', 'Kentucky', 'Louisiana', 'Maine', 'Maryland',
+    'Massachusetts', 'Michigan', 'Minnesota', 'Mississippi', 'Missouri', 'Montana',
+    'Nebraska', 'Nevada', 'New Hampshire', 'New Jersey', 'New Mexico', 'New York',
+    'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon', 'Pennsylvania',
+    'Rhode Island', 'South Carolina', 'South Dakota', 'Tennessee', 'Texas', 'Utah',
+    'Vermont', 'Virginia', 'Washington', 'West Virginia', 'Wisconsin', 'Wyoming'
+]
+
+# Phrase -> the value the chatbot uses to look the member up
+MEMBER_TERMS = {
+    'ermias': 'Ermias', 'gaga': 'Ermias',
+    'amanda': 'Amanda', 'qianyue': 'Amanda',
+    'amos': 'Amos',
+    'damola': 'Damola', 'adedamola': 'Damola', 'atekoja': 'Damola',
+    'maria': 'Maria', 'lorena': 'Maria'
+}
+
+YEARS = [str(year) for year in range(2004, 2018)]
+
+# Misspellings are only corrected for these kinds, in words of at least
+# FUZZY_MIN_LENGTH characters that are not English words: one edit below
+# FUZZY_TWO_EDIT_LENGTH, two from it
+FUZZY_KINDS = {'condition', 'state', 'city', 'member'}
+FUZZY_MIN_LENGTH = 5
+FUZZY_TWO_EDIT_LENGTH = 9
+# Rank penalty per edit, so exact mentions always beat corrected ones
+FUZZY_PENALTY = 10000
+
+# How long a matcher built without cities is kept before loading them again
+CITY_RETRY_SECONDS = float(os.environ.get('ENTITY_CITY_RETRY_SECONDS', '30'))
+
+CITY_SQL = """
+SELECT city, state, location_id
+FROM location
+WHERE city IS NOT NULL
+"""
+
+# DMA names join the areas they cover with '-', '&' and parentheses
+# ("Cheyenne WY-Scottsbluff"); parts shorter than this are not matched alone
+NAME_SEPARATORS = re.compile(r"[-&()]")
+POSTAL_SUFFIX = re.compile(r"\s+[A-Z]{2}$")
+CITY_PART_MIN_LENGTH = 4
+
+
+@lru_cache(maxsize=None)
+def textblob_words(filename):
+    """Words in one of the word lists TextBlob ships, or an empty set without TextBlob
+
+    The file is read directly, so TextBlob and NLTK are never imported.
+    """
+    spec = find_spec('textblob')
+    if spec is None or not spec.submodule_search_locations:
+        return frozenset()
+    path = os.path.join(spec.submodule_search_locations[0], 'en', filename)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return frozenset(line.split()[0] for line in f
+                             if line.strip() and not line.startswith(';;;'))
+    except OSError as e:
+        print(f"Error reading word list {filename}: {e}")
+        return frozenset()
+
+
+@lru_cache(maxsize=None)
+def ordinary_words():
+    """Lowercase entries of TextBlob's part-of-speech lexicon: common words, not names"""
+    return frozenset(word for word in textblob_words('en-lexicon.txt') if word.islower())
+
+
+@lru_cache(maxsize=None)
+def english_words():
+    """Ordinary words plus TextBlob's spelling list, which also has names like indian and dakota"""
+    return ordinary_words() | textblob_words('en-spelling.txt')
+
+#################################################
+# Compiled Matcher
+##################################################
+
+WORD = re.compile(r"\w+")
+
+def edit_distance(a, b, limit=None):
+    """Optimal string alignment distance: Levenshtein plus adjacent transpositions
+
+    With a limit, gives up as soon as the distance must exceed it and
+    returns limit + 1.
+    """
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def trigrams(word):
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Trigram postings over a fixed vocabulary for bounded edit-distance lookups
+
+    Postings are kept per word length, so a query only counts trigrams
+    against words within max_distance characters of its own length. One
+    edit changes at most four padded trigrams, so only words sharing
+    enough of them are then compared character by character.
+    """
+
+    def __init__(self, words=()):
+        self.words = list(words)
+        self.postings = {}
+        for index, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self.postings.setdefault((gram, len(word)), []).append(index)
+
+    def search(self, word, max_distance):
+        """(distance, word) for every vocabulary word within max_distance"""
+        grams = trigrams(word)
+        shared = {}
+        for length in range(len(word) - max_distance, len(word) + max_distance + 1):
+            for gram in grams:
+                for index in self.postings.get((gram, length), ()):
+                    shared[index] = shared.get(index, 0) + 1
+
+        needed = len(grams) - 4 * max_distance
+        results = []
+        for index, count in shared.items():
+            if count < needed:
+                continue
+            term = self.words[index]
+            distance = edit_distance(word, term, max_distance)
+            if distance <= max_distance:
+                results.append((distance, term))
+        return results
+
+
+def name_parts(name):
+    """The areas a DMA name is made of, or [] for a single-area name"""
+    parts = [POSTAL_SUFFIX.sub('', part.strip()) for part in NAME_SEPARATORS.split(name)]
+    parts = [part for part in parts if part]
+    return parts if len(parts) > 1 else []
+
+
+class CityIndex:
+    """Every DMA area by location_id, and the names that refer to it
+
+    Areas are kept as (name, location_id) pairs because some names cover
+    two areas (Columbus is one in Georgia and one in Ohio). Such a name
+    resolves to all of its areas, and "<name>, <state>" to one. Each part
+    of a combined name ("Sweetwater" in "Abilene-Sweetwater") resolves to
+    the areas it is part of, unless it is an ordinary word like the
+    "Cities" of "Tri-Cities".
+
+    search() finds names by case-insensitive substring, bisecting the
+    sorted suffixes of every name, so the lookup is O(log n) in the number
+    of suffixes plus the matches. Matches are ranked exact name first, then
+    name prefix, then component prefix, then anywhere inside a word,
+    shorter names first within each.
+    """
+
+    def __init__(self, locations=(), ordinary=frozenset()):
+        self.areas = {}
+        for city, state, location_id in locations:
+            if city and location_id is not None:
+                self.areas[int(location_id)] = (city.strip(' ,'), state)
+        self.by_name = {}
+        for location_id, (name, _) in sorted(self.areas.items()):
+            self.by_name.setdefault(name, []).append(location_id)
+
+        # label -> location_ids, and (phrase, label) for the entity trie, most specific first
+        self.labels = dict(self.by_name)
+        self.phrases = [(name, name) for name in sorted(self.by_name)]
+        for location_id, (name, state) in sorted(self.areas.items()):
+            self.labels[self.label(location_id)] = [location_id]
+            if state:
+                self.phrases.append((f"{name} {state}", self.label(location_id)))
+
+        parts = {}
+        for name, location_ids in self.by_name.items():
+            for part in name_parts(name):
+                if part in self.by_name or len(part) < CITY_PART_MIN_LENGTH:
+                    continue
+                if ' ' not in part and part.lower() in ordinary:
+                    continue
+                parts.setdefault(part, set()).update(location_ids)
+        for part, location_ids in sorted(parts.items()):
+            location_ids = sorted(location_ids)
+            if len(location_ids) == 1:
+                self.phrases.append((part, self.label(location_ids[0])))
+            else:
+                self.labels[part] = location_ids
+                self.phrases.append((part, part))
+
+        self.entries = sorted((name, location_id) for location_id, (name, _) in self.areas.items())
+        self.suffixes = sorted(
+            (name.lower()[start:], start, position)
+            for position, (name, _) in enumerate(self.entries)
+            for start in range(len(name))
+            if not name[start].isspace()
+        )
+
+    def label(self, location_id):
+        """Name of an area, with its state when another area has the same name"""
+        name, state = self.areas[location_id]
+        return name if len(self.by_name[name]) == 1 else f"{name}, {state}"
+
+    def _rank(self, name, start, query):
+        if start == 0:
+            return 0 if name.lower() == query else 1
+        return 2 if not name[start - 1].isalnum() else 3
+
+    def search(self, query, limit=None):
+        """location_ids of the areas whose name contains query, best match first"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        best = {}
+        i = bisect_left(self.suffixes, (query,))
+        while i < len(self.suffixes) and self.suffixes[i][0].startswith(query):
+            _, start, position = self.suffixes[i]
+            rank = self._rank(self.entries[position][0], start, query)
+            best[position] = min(rank, best.get(position, rank))
+            i += 1
+        ranked = sorted(best, key=lambda p: (best[p], len(self.entries[p][0]), self.entries[p]))
+        return [self.entries[p][1] for p in ranked[:limit]]
+
+    def resolve(self, name):
+        """location_ids a city entity or free-text name refers to; several when it is ambiguous"""
+        if name in self.labels:
+            return list(self.labels[name])
+        matches = self.search(name, limit=1)
+        if not matches:
+            return []
+        return list(self.by_name[self.areas[matches[0]][0]])
+
+
+class EntityMatcher:
+    """Every vocabulary compiled into one word-level trie
+
+    The question is tokenized once and walked left to right, taking the
+    longest phrase that starts at each word, so lookup cost depends on the
+    question length rather than on how many states, cities or synonyms are
+    known. Each phrase carries a rank so that, when a question mentions two
+    values of the same kind, the pick does not depend on word order.
+
+    Leftover words that are not English words are then corrected against
+    a trigram index of the words in condition, state, city and member
+    phrases, and the trie is walked again, so "diabtes", "califronia" or
+    "north carolna" still resolve while "marine" and "indian" stay as they
+    are. That costs a few postings lookups per leftover word, not a scan
+    of the vocabulary. Without TextBlob's word lists nothing is corrected.
+    """
+
+    def __init__(self, locations=(), version=None):
+        self.version = version
+        self.cities = CityIndex(locations, ordinary_words())
+        self.trie = {}
+        self.fuzzy_words = set()
+        for rank, intent in enumerate(INTENT_PRIORITY):
+            for term in INTENT_TERMS[intent]:
+                self._add(term, 'intent', intent, -rank)
+        for rank, (condition, terms) in enumerate(CONDITION_TERMS.items()):
+            # Exact condition names outrank synonyms
+            self._add(terms[0], 'condition', condition, rank)
+            for term in terms[1:]:
+                self._add(term, 'condition', condition, len(CONDITION_TERMS) + rank)
+        for rank, state in enumerate(US_STATES):
+            self._add(state, 'state', state, rank)
+        for rank, (phrase, label) in enumerate(self.cities.phrases):
+            self._add(phrase, 'city', label, rank)
+        for term, member in MEMBER_TERMS.items():
+            self._add(term, 'member', member, 0)
+        for rank, year in enumerate(YEARS):
+            self._add(year, 'year', year, rank)
+
+        self.fuzzy = TrigramIndex(sorted(self.fuzzy_words))
+        self.dictionary = english_words()
+
+    def _add(self, term, kind, value, rank):
+        words = WORD.findall(term.lower())
+        if not words:
+            return
+        node = self.trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node.setdefault(None, []).append((kind, value, rank))
+        if kind in FUZZY_KINDS:
+            self.fuzzy_words.update(words)
+
+    def _walk(self, words):
+        """(start, end, entities) for the longest phrase at each word, or (i, i + 1, None)"""
+        i = 0
+        while i < len(words):
+            node, end, hit = self.trie, i, None
+            while end < len(words) and words[end] in node:
+                node = node[words[end]]
+                end += 1
+                if None in node:
+                    hit, consumed = node[None], end
+            if hit:
+                yield i, consumed, hit
+                i = consumed
+            else:
+                yield i, i + 1, None
+                i += 1
+
+    def matches(self, question):
+        """(kind, value, rank) for each phrase found, longest match first at each word"""
+        words = WORD.findall(question.lower())
+        found = []
+        unmatched = []
+        for start, end, hit in self._walk(words):
+            if hit:
+                found.extend(hit)
+            else:
+                unmatched.append(start)
+        return found + self._fuzzy_matches(words, unmatched)
+
+    def _fuzzy_matches(self, words, unmatched):
+        """Phrases that match once misspelled leftover words are corrected"""
+        if not self.dictionary:
+            return []
+        corrected = list(words)
+        edits = {}
+        for i in unmatched:
+            word = words[i]
+            if len(word) < FUZZY_MIN_LENGTH or word in self.dictionary:
+                continue
+            max_distance = 1 if len(word) < FUZZY_TWO_EDIT_LENGTH else 2
+            hits = self.fuzzy.search(word, max_distance)
+            if hits:
+                edits[i], corrected[i] = min(hits)
+        if not edits:
+            return []
+
+        # Only phrases that needed a correction; the rest were found already
+        found = []
+        for start, end, hit in self._walk(corrected):
+            distance = sum(edits.get(i, 0) for i in range(start, end))
+            if hit and distance:
+                found.extend((kind, value, rank + FUZZY_PENALTY * distance)
+                             for kind, value, rank in hit if kind in FUZZY_KINDS)
+        return found
+
+    def extract(self, question):
+        """All entities in the question from a single scan"""
+        entities = {
+            'condition': None,
+            'state': None,
+            'city': None,
+            'year': None,
+            'member': None,
+            'intent': None
+        }
+        best = {}
+        for kind, value, rank in self.matches(question):
+            if kind not in best or rank < best[kind][1]:
+                best[kind] = (value, rank)
+        for kind, (value, _) in best.items():
+            entities[kind] = value
+        return entities
+
+#################################################
+# Per-Worker Matcher Management
+##################################################
+
+_lock = threading.Lock()
+_matcher = None
+# monotonic time after which a matcher built without cities is rebuilt
+_retry_at = None
+
+def _load_locations(engine):
+    """(city, state, location_id) for every area"""
+    snapshot = get_snapshot(engine)
+    if snapshot is not None:
+        locations = snapshot.locations
+    else:
+        locations = pdsql.read_sql(CITY_SQL, engine)
+    locations = locations.dropna(subset=['city', 'location_id'])
+    return list(locations[['city', 'state', 'location_id']].itertuples(index=False, name=None))
+
+def _is_current(matcher, version):
+    if matcher is None or matcher.version != version:
+        return False
+    return _retry_at is None or time.monotonic() < _retry_at
+
+def get_entity_matcher(engine):
+    """Return this worker's matcher, rebuilding it when the dataset version changes"""
+    global _matcher, _retry_at
+    version, _ = current_dataset_version(engine)
+    matcher = _matcher
+    if _is_current(matcher, version):
+        return matcher
+
+    with _lock:
+        if not _is_current(_matcher, version):
+            try:
+                _matcher = EntityMatcher(_load_locations(engine), version)
+                _retry_at = None
+            except Exception as e:
+                # Match everything but cities, and load them again after CITY_RETRY_SECONDS
+                print(f"Error loading cities for entity matching: {e}")
+                _matcher = EntityMatcher(version=version)
+                _retry_at = time.monotonic() + CITY_RETRY_SECONDS
+        return _matcher
+
+#################################################
+# Intent Keyword Index
+##################################################
+
+class KeywordIndex:
+    """Inverted index from knowledge-base keywords and aliases to response types
+
+    Every word n-gram of the question is looked up once. A response type
+    scores the number of words in each distinct phrase of its own that
+    matched, so longer, more specific phrases count for more. Ties go to
+    the type listed first in the knowledge base.
+    """
+
+    def __init__(self, knowledge_base):
+        self.order = {name: i for i, name in enumerate(knowledge_base)}
+        self.postings = {}
+        for name, info in knowledge_base.items():
+            aliases = info.get('aliases', [])
+            if isinstance(aliases, dict):
+                aliases = [alias for group in aliases.values() for alias in group]
+            for phrase in list(info.get('keywords', [])) + list(aliases):
+                key = ' '.join(WORD.findall(phrase.lower()))
+                if key:
+                    self.postings.setdefault(key, set()).add(name)
+        self.max_words = max((len(key.split()) for key in self.postings), default=0)
+
+    def scores(self, question):
+        """Score of every response type with at least one matching phrase"""
+        words = WORD.findall(question.lower())
+        matched = set()
+        for n in range(1, self.max_words + 1):
+            for i in range(len(words) - n + 1):
+                key = ' '.join(words[i:i + n])
+                if key in self.postings:
+                    matched.add(key)
+
+        scores = {}
+        for key in matched:
+            weight = key.count(' ') + 1
+            for name in self.postings[key]:
+                scores[name] = scores.get(name, 0) + weight
+        return scores
+
+    def best(self, scores):
+        """Highest scoring response type, or None when nothing matched"""
+        if not scores:
+            return None
+        return min(scores, key=lambda name: (-scores[name], self.order[name]))
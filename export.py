@@ -0,0 +1,74 @@
+# export.py - constant-memory CSV / NDJSON streaming for the data routes
+import csv
+import io
+import json
+import os
+
+from sqlalchemy import text
+
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', '5000'))
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def stream_query(engine, sql, params=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the column names, then lists of rows, from a server-side cursor
+
+    The connection stays checked out until the generator is exhausted or
+    closed, and at most one chunk of rows is held in memory at a time.
+    """
+    conn = engine.connect().execution_options(stream_results=True,
+                                              max_row_buffer=chunk_rows)
+    try:
+        result = conn.execute(text(sql), params or {})
+        yield list(result.keys())
+        for rows in result.partitions(chunk_rows):
+            yield rows
+    finally:
+        conn.close()
+
+
+def stream_frame(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Same shape as stream_query for a result that is already in memory"""
+    yield list(df.columns)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].itertuples(index=False, name=None)
+
+
+def _json_default(value):
+    # NumPy scalars, Decimals and dates coming out of pandas or the driver
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def encode_csv(chunks):
+    """Turn a stream_query / stream_frame generator into CSV text chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(next(chunks))
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_ndjson(chunks):
+    """Turn a stream_query / stream_frame generator into NDJSON text chunks"""
+    columns = next(chunks)
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=_json_default) + '\n'
+                      for row in rows)
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson
+}
@@ -0,0 +1,214 @@
+# http_cache.py - HTTP caching for the read-only data routes
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip alone is still served
+    brotli = None
+
+# 0 means caches may store responses but must revalidate them every time
+MAX_AGE = int(os.environ.get('DATA_CACHE_MAX_AGE', '0'))
+CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 11
+
+# Headers the cache recomputes for each representation
+_SKIPPED_HEADERS = {'content-length', 'content-encoding', 'etag', 'last-modified',
+                    'cache-control', 'vary'}
+
+#################################################
+# Precompressed Response Cache
+##################################################
+
+class CachedPayload:
+    """One rendered route payload and its compressed encodings"""
+
+    def __init__(self, body, mimetype, headers):
+        self.encodings = {'identity': body}
+        self.mimetype = mimetype
+        self.headers = headers
+
+    @property
+    def size(self):
+        return sum(len(b) for b in self.encodings.values())
+
+
+class ResponseCache:
+    """Bounded LRU of route payloads for the current dataset version
+
+    gzip is produced when an entry is stored; brotli is much slower at high
+    quality, so it is built on a background thread and served once ready.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='brotli')
+
+    def _reset_for(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, version, key):
+        with self._lock:
+            self._reset_for(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, version, key, body, mimetype, headers):
+        entry = CachedPayload(body, mimetype, headers)
+        entry.encodings['gzip'] = gzip.compress(body, GZIP_LEVEL)
+        if entry.size > self.max_bytes:
+            return entry
+
+        with self._lock:
+            self._reset_for(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+        if brotli is not None:
+            self._compressor.submit(self._add_brotli, version, key, entry)
+        return entry
+
+    def _add_brotli(self, version, key, entry):
+        encoded = brotli.compress(entry.encodings['identity'], quality=BROTLI_QUALITY)
+        with self._lock:
+            entry.encodings['br'] = encoded
+            if self._version == version and self._entries.get(key) is entry:
+                self._bytes += len(encoded)
+                self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+#################################################
+# Conditional GET
+##################################################
+
+def _validators(get_version):
+    """Dataset version, ETag and Last-Modified for the dataset currently loaded"""
+    version, loaded_at = get_version()
+    etag = f"health-v{version}"
+    last_modified = None
+    if loaded_at is not None:
+        if loaded_at.tzinfo is None:
+            # Only SQLite fixtures store a naive time, from CURRENT_TIMESTAMP, which is UTC
+            loaded_at = loaded_at.replace(tzinfo=timezone.utc)
+        last_modified = loaded_at.astimezone(timezone.utc).replace(microsecond=0)
+    return version, etag, last_modified
+
+
+def _variant_etag(etag, encoding):
+    return etag if encoding == 'identity' else f"{etag}-{encoding}"
+
+
+def _not_modified(etag, last_modified):
+    """True when the client's validators still match the loaded dataset"""
+    if request.if_none_match:
+        return any(request.if_none_match.contains_weak(_variant_etag(etag, encoding))
+                   for encoding in ('identity', 'gzip', 'br'))
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _negotiate(available):
+    """Best encoding the client accepts among those already built"""
+    offered = [e for e in ('br', 'gzip') if e in available] + ['identity']
+    return request.accept_encodings.best_match(offered, default='identity') or 'identity'
+
+
+def _add_headers(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    if MAX_AGE:
+        response.cache_control.max_age = MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _from_cache(entry, etag, last_modified):
+    encoding = _negotiate(entry.encodings)
+    response = current_app.response_class(entry.encodings[encoding], mimetype=entry.mimetype)
+    for name, value in entry.headers:
+        response.headers[name] = value
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return _add_headers(response, _variant_etag(etag, encoding), last_modified)
+
+
+def _reports_failure(response):
+    """True for a JSON body with success: false, which must not be cached or tagged"""
+    if response.is_streamed or not response.is_json:
+        return False
+    payload = response.get_json(silent=True)
+    return isinstance(payload, dict) and payload.get('success') is False
+
+
+def conditional(get_version, cache=None):
+    """Decorator factory: answer 304 while the dataset version is unchanged
+
+    get_version returns (version, loaded_at) for the loaded dataset; the
+    view only runs when the client has no matching copy. With a cache, the
+    rendered payload is kept per URL and served precompressed until the
+    version changes. Non-200 responses and bodies reporting success: false
+    are passed through untagged, so a failure is never pinned to a version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, etag, last_modified = _validators(get_version)
+            if _not_modified(etag, last_modified):
+                return _add_headers(make_response('', 304), etag, last_modified)
+
+            key = request.full_path
+            if cache is not None:
+                entry = cache.get(version, key)
+                if entry is not None:
+                    return _from_cache(entry, etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or _reports_failure(response):
+                return response
+            if cache is None or response.is_streamed:
+                return _add_headers(response, etag, last_modified)
+
+            headers = [(k, v) for k, v in response.headers.items()
+                       if k.lower() not in _SKIPPED_HEADERS and k.lower() != 'content-type']
+            entry = cache.put(version, key, response.get_data(), response.mimetype, headers)
+            return _from_cache(entry, etag, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,169 @@
+# olap_query.py - dimensions, measures and filters for /api/query, planned onto rollups or SQL
+import pandas.io.sql as pdsql
+from sqlalchemy import bindparam, text
+
+from snapshot import CONDITION_COLUMNS, MEASURES, TOTAL_MEASURE, get_snapshot
+from table_query import MAX_PAGE_SIZE, QueryParamError
+
+# Dimension -> column in the base tables; location columns need the join
+DIMENSION_COLUMNS = {
+    'state': 'l.state',
+    'city': 'l.city',
+    'postal': 'l.postal',
+    'latitude': 'l.latitude',
+    'longitude': 'l.longitude',
+    'year': 's.year'
+}
+LOCATION_DIMENSIONS = {'state', 'city', 'postal', 'latitude', 'longitude'}
+
+# Measure -> summed expression over search_condition
+MEASURE_COLUMNS = dict(
+    [(column.lower(), f's."{column}"') for column in CONDITION_COLUMNS] +
+    [(TOTAL_MEASURE, ' + '.join(f's."{column}"' for column in CONDITION_COLUMNS))]
+)
+QUERY_MEASURES = MEASURES + [TOTAL_MEASURE]
+
+# Dimensions a client may filter on with ?name=a,b, and the integer ones
+FILTER_DIMENSIONS = ['state', 'city', 'postal', 'year']
+INTEGER_DIMENSIONS = {'year'}
+
+# Rollup tables and the dimensions they are grouped by, smallest first
+ROLLUP_TABLES = [
+    ('rollup_year', {'year'}),
+    ('rollup_state', {'state', 'postal'}),
+    ('rollup_city', {'city', 'postal', 'state', 'latitude', 'longitude'}),
+    ('rollup_state_year', {'state', 'postal', 'year'}),
+    ('rollup_location_year', {'state', 'latitude', 'longitude', 'year'})
+]
+
+
+def _names(args, key, allowed):
+    names = [n.strip() for n in args.get(key, '').split(',') if n.strip()]
+    unknown = [n for n in names if n not in allowed]
+    if unknown:
+        raise QueryParamError(f"Unknown {key}: {', '.join(unknown)}. "
+                              f"Available: {', '.join(allowed)}")
+    return list(dict.fromkeys(names))
+
+
+def _integer(key, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryParamError(f"{key} must be an integer")
+
+
+def parse_olap_query(args):
+    """Validate dimensions, measures, filters, order and limit from a query string
+
+    Filters are ?state=Texas,Ohio style lists, plus year_from / year_to
+    for a range of years. order is a comma-separated list of selected
+    dimensions or measures, each prefixed with '-' for descending.
+    """
+    dimensions = _names(args, 'dimensions', list(DIMENSION_COLUMNS))
+    measures = _names(args, 'measures', QUERY_MEASURES) or [TOTAL_MEASURE]
+
+    filters = {}
+    for dimension in FILTER_DIMENSIONS:
+        values = [v.strip() for v in args.get(dimension, '').split(',') if v.strip()]
+        if values:
+            if dimension in INTEGER_DIMENSIONS:
+                values = [_integer(dimension, v) for v in values]
+            filters[dimension] = values
+    if args.get('year_from') or args.get('year_to'):
+        if 'year' in filters:
+            raise QueryParamError("Use either year or year_from / year_to")
+        filters['year'] = {}
+        if args.get('year_from'):
+            filters['year']['min'] = _integer('year_from', args['year_from'])
+        if args.get('year_to'):
+            filters['year']['max'] = _integer('year_to', args['year_to'])
+
+    order_by = []
+    for item in [o.strip() for o in args.get('order', '').split(',') if o.strip()]:
+        name = item.lstrip('-')
+        if name not in dimensions and name not in measures:
+            raise QueryParamError(f"Cannot order by {name}: it is not a selected dimension or measure")
+        order_by.append((name, not item.startswith('-')))
+
+    limit = None
+    if args.get('limit'):
+        limit = _integer('limit', args['limit'])
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise QueryParamError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    return {'dimensions': dimensions, 'measures': measures, 'filters': filters,
+            'order_by': order_by, 'limit': limit}
+
+
+def plan_source(query):
+    """Smallest rollup table grouped by every dimension the query uses, or 'search_condition'"""
+    used = set(query['dimensions']) | set(query['filters'])
+    for table, dimensions in ROLLUP_TABLES:
+        if used <= dimensions:
+            return table
+    return 'search_condition'
+
+
+def build_olap_query(query, source):
+    """Parameterized GROUP BY over a rollup table or the base tables
+
+    Rows come back ordered by the requested order, then by the dimensions,
+    which is the order the snapshot returns them in.
+    """
+    dimensions, measures, filters = query['dimensions'], query['measures'], query['filters']
+    if source == 'search_condition':
+        columns = {d: DIMENSION_COLUMNS[d] for d in DIMENSION_COLUMNS}
+        sums = {m: f'SUM({MEASURE_COLUMNS[m]})' for m in measures}
+        table = 'search_condition s'
+        if (set(dimensions) | set(filters)) & LOCATION_DIMENSIONS:
+            table += '\nINNER JOIN location l ON s.location_id = l.location_id'
+    else:
+        columns = {d: d for d in DIMENSION_COLUMNS}
+        sums = {m: f'SUM({m})' for m in measures}
+        table = source
+
+    select = [f'{columns[d]} AS "{d}"' for d in dimensions] + [f'{sums[m]} AS "{m}"' for m in measures]
+    where, params, expanding = [], {}, []
+    for dimension, value in filters.items():
+        if isinstance(value, dict):
+            if 'min' in value:
+                where.append(f'{columns[dimension]} >= :{dimension}_min')
+                params[f'{dimension}_min'] = value['min']
+            if 'max' in value:
+                where.append(f'{columns[dimension]} <= :{dimension}_max')
+                params[f'{dimension}_max'] = value['max']
+        else:
+            where.append(f'{columns[dimension]} IN :{dimension}')
+            params[dimension] = list(value)
+            expanding.append(dimension)
+
+    sql = f"SELECT {', '.join(select)}\nFROM {table}"
+    if where:
+        sql += "\nWHERE " + "\n  AND ".join(where)
+    if dimensions:
+        sql += f"\nGROUP BY {', '.join(columns[d] for d in dimensions)}"
+    ordering = [f'"{name}" {"ASC" if ascending else "DESC"}' for name, ascending in query['order_by']]
+    ordering += [f'"{d}"' for d in dimensions]
+    if ordering:
+        sql += f"\nORDER BY {', '.join(ordering)}"
+    if query['limit'] is not None:
+        sql += "\nLIMIT :limit"
+        params['limit'] = query['limit']
+
+    statement = text(sql).bindparams(*[bindparam(name, expanding=True) for name in expanding])
+    return statement, params
+
+
+def run_olap_query(engine, query):
+    """(source, DataFrame) for a parsed query, from the cheapest source available
+
+    The in-memory snapshot answers any query; without it the smallest
+    rollup table that covers the query is used, then the base tables.
+    """
+    snapshot = get_snapshot(engine)
+    if snapshot is not None:
+        return 'snapshot', snapshot.aggregate(**query)
+    source = plan_source(query)
+    sql, params = build_olap_query(query, source)
+    return source, pdsql.read_sql(sql, engine, params=params)
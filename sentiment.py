@@ -0,0 +1,109 @@
+# sentiment.py - QUESTION SENTIMENT FOR THE CHATBOT
+import os
+import re
+
+# 'lexicon' (built in, default) or 'textblob' (needs textblob + nltk installed)
+SENTIMENT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'lexicon')
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+# Polarity in [-1, 1] for the words chat questions actually use, on the same
+# scale as the pattern lexicon TextBlob ships with
+LEXICON = {
+    'afraid': -0.6, 'amazing': 0.6, 'angry': -0.5, 'annoying': -0.8, 'anxious': -0.25,
+    'average': -0.15, 'awesome': 1.0, 'awful': -1.0, 'bad': -0.7, 'best': 1.0,
+    'better': 0.5, 'boring': -1.0, 'brilliant': 0.9, 'broken': -0.4, 'clear': 0.1,
+    'common': -0.3, 'complex': -0.3, 'confusing': -0.3, 'cool': 0.35, 'dangerous': -0.6,
+    'deadly': -0.2, 'detailed': 0.4, 'difficult': -0.5, 'disappointing': -0.6,
+    'easy': 0.43, 'excellent': 1.0, 'false': -0.4, 'fantastic': 0.4, 'fascinating': 0.7,
+    'few': -0.2, 'fine': 0.42, 'first': 0.25, 'frustrating': -0.4, 'full': 0.35,
+    'glad': 0.5, 'good': 0.7, 'great': 0.8, 'happy': 0.8, 'hard': -0.29, 'hate': -0.8,
+    'healthy': 0.5, 'helpful': 0.5, 'high': 0.16, 'horrible': -1.0, 'huge': 0.4,
+    'ill': -0.5, 'important': 0.4, 'impressive': 1.0, 'interesting': 0.5, 'large': 0.21,
+    'latest': 0.5, 'less': -0.17, 'love': 0.5, 'main': 0.17, 'many': 0.5, 'more': 0.5,
+    'most': 0.5, 'much': 0.2, 'negative': -0.3, 'new': 0.14, 'nice': 0.6, 'perfect': 1.0,
+    'pleased': 0.5, 'poor': -0.4, 'popular': 0.6, 'positive': 0.23, 'rare': 0.3,
+    'real': 0.2, 'sad': -0.5, 'safe': 0.5, 'scary': -0.5, 'serious': -0.33, 'sick': -0.71,
+    'significant': 0.38, 'small': -0.25, 'special': 0.36, 'strong': 0.43, 'stupid': -0.8,
+    'surprising': 0.7, 'terrible': -1.0, 'thanks': 0.2, 'top': 0.5, 'true': 0.35,
+    'typical': -0.17, 'unhappy': -0.6, 'useful': 0.3, 'useless': -0.5, 'weak': -0.38,
+    'whole': 0.2, 'wonderful': 1.0, 'worse': -0.4, 'worst': -1.0, 'wrong': -0.5
+}
+
+INTENSIFIERS = {'very': 1.3, 'really': 1.3, 'so': 1.3, 'too': 1.3, 'extremely': 1.5,
+                'incredibly': 1.5, 'quite': 1.1, 'pretty': 1.1}
+NEGATIONS = {'not', 'no', 'never', 'nothing', 'hardly', 'barely'}
+NEGATION_FACTOR = -0.5
+
+WORD = re.compile(r"[a-z']+")
+
+#################################################
+# Scorers
+##################################################
+
+class LexiconSentiment:
+    """Average polarity of the lexicon words in a text, scored in one pass
+
+    A negation flips and halves the next scored word and an intensifier
+    scales it, as TextBlob does, so the two backends bucket most questions
+    the same way.
+    """
+
+    name = 'lexicon'
+
+    def __init__(self, lexicon=LEXICON):
+        self.lexicon = lexicon
+
+    def polarity(self, text):
+        total = 0.0
+        scored = 0
+        factor = 1.0
+        for word in WORD.findall(text.lower()):
+            if word in self.lexicon:
+                total += max(-1.0, min(1.0, self.lexicon[word] * factor))
+                scored += 1
+                factor = 1.0
+            elif word in NEGATIONS or word.endswith("n't"):
+                factor *= NEGATION_FACTOR
+            elif word in INTENSIFIERS:
+                factor *= INTENSIFIERS[word]
+            else:
+                factor = 1.0
+        return total / scored if scored else 0.0
+
+
+class TextBlobSentiment:
+    """TextBlob's pattern analyzer, imported only when this backend is chosen"""
+
+    name = 'textblob'
+
+    def __init__(self):
+        from textblob import TextBlob
+        self._blob = TextBlob
+
+    def polarity(self, text):
+        return self._blob(text).sentiment.polarity
+
+
+SENTIMENT_BACKENDS = {
+    'lexicon': LexiconSentiment,
+    'textblob': TextBlobSentiment
+}
+
+def sentiment_label(polarity):
+    """Bucket a polarity score the way the chatbot reports it"""
+    if polarity > POSITIVE_THRESHOLD:
+        return 'positive'
+    if polarity < NEGATIVE_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+def create_sentiment_scorer(backend=SENTIMENT_BACKEND):
+    """Scorer for SENTIMENT_BACKEND, falling back to the lexicon if TextBlob is missing"""
+    if backend not in SENTIMENT_BACKENDS:
+        raise ValueError(f"Unknown sentiment backend: {backend}")
+    try:
+        return SENTIMENT_BACKENDS[backend]()
+    except ImportError as e:
+        print(f"Error loading {backend} sentiment backend, using lexicon: {e}")
+        return LexiconSentiment()
@@ -0,0 +1,172 @@
+# session_store.py - BOUNDED CONVERSATION HISTORY FOR THE CHATBOT
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_BACKEND = os.environ.get('CHAT_SESSION_BACKEND', 'memory')
+SESSION_DB_PATH = os.environ.get('CHAT_SESSION_DB', 'chat_sessions.sqlite3')
+SESSION_MAX_SESSIONS = int(os.environ.get('CHAT_SESSION_MAX_SESSIONS', '10000'))
+SESSION_IDLE_SECONDS = float(os.environ.get('CHAT_SESSION_IDLE_SECONDS', '1800'))
+SESSION_MAX_BYTES = int(os.environ.get('CHAT_SESSION_MAX_BYTES', str(32 * 1024 * 1024)))
+SESSION_MAX_TURNS = 10
+
+def _encode(turns):
+    return json.dumps(turns, default=str)
+
+#################################################
+# In-Memory Backend
+##################################################
+
+class MemorySessionStore:
+    """Per-worker LRU of session histories with idle expiry and a byte budget
+
+    Sessions are kept in least-recently-used order, so expired sessions
+    are always at the front and eviction never scans the whole store.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS,
+                 max_bytes=SESSION_MAX_BYTES, max_turns=SESSION_MAX_TURNS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        # session_id -> (last_seen, turns, size in bytes)
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Turns recorded for a session, oldest first"""
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._sessions.get(session_id)
+            return list(entry[1]) if entry else []
+
+    def append(self, session_id, turn):
+        """Record a turn, keeping only the last max_turns of the session"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            _, turns, size = self._sessions.pop(session_id, (None, [], 0))
+            turns = (turns + [turn])[-self.max_turns:]
+            self._bytes -= size
+            size = len(_encode(turns))
+            self._sessions[session_id] = (now, turns, size)
+            self._bytes += size
+            while self._sessions and (len(self._sessions) > self.max_sessions
+                                      or self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._sessions.popitem(last=False)
+                self._bytes -= evicted
+
+    def _expire(self, now):
+        while self._sessions:
+            session_id, (last_seen, _, size) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.idle_seconds:
+                break
+            del self._sessions[session_id]
+            self._bytes -= size
+
+    def __len__(self):
+        return len(self._sessions)
+
+#################################################
+# SQLite Backend
+##################################################
+
+class SQLiteSessionStore:
+    """Session histories in a local SQLite file shared by every worker
+
+    Same limits as the in-memory store. Expired and over-budget sessions
+    are pruned every prune_every writes rather than on each one.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=SESSION_MAX_SESSIONS,
+                 idle_seconds=SESSION_IDLE_SECONDS, max_bytes=SESSION_MAX_BYTES,
+                 max_turns=SESSION_MAX_TURNS, prune_every=100):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                turns TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_seen REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_last_seen_idx "
+                           "ON chat_sessions (last_seen)")
+
+    def get(self, session_id):
+        """Turns recorded for a session, oldest first"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT turns FROM chat_sessions WHERE session_id = ? AND last_seen >= ?",
+                (session_id, time.time() - self.idle_seconds)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def append(self, session_id, turn):
+        """Record a turn, keeping only the last max_turns of the session"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT turns FROM chat_sessions WHERE session_id = ? AND last_seen >= ?",
+                    (session_id, now - self.idle_seconds)).fetchone()
+                turns = (json.loads(row[0]) if row else []) + [turn]
+                encoded = _encode(turns[-self.max_turns:])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chat_sessions (session_id, turns, size, last_seen) "
+                    "VALUES (?, ?, ?, ?)", (session_id, encoded, len(encoded), now))
+                self._writes += 1
+                if self._writes % self.prune_every == 0:
+                    self._prune(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _prune(self, now):
+        self._conn.execute("DELETE FROM chat_sessions WHERE last_seen < ?",
+                           (now - self.idle_seconds,))
+        # Drop least recently used sessions beyond the count and byte budgets
+        self._conn.execute("""
+            DELETE FROM chat_sessions WHERE session_id IN (
+                SELECT session_id FROM (
+                    SELECT session_id,
+                           ROW_NUMBER() OVER (ORDER BY last_seen DESC) AS position,
+                           SUM(size) OVER (ORDER BY last_seen DESC
+                                           ROWS UNBOUNDED PRECEDING) AS running_bytes
+                    FROM chat_sessions
+                )
+                WHERE position > ? OR running_bytes > ?
+            )""", (self.max_sessions, self.max_bytes))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+#################################################
+# Backend Selection
+##################################################
+
+SESSION_BACKENDS = {
+    'memory': MemorySessionStore,
+    'sqlite': SQLiteSessionStore
+}
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Session store for CHAT_SESSION_BACKEND ('memory' or 'sqlite')"""
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown chat session backend: {backend}")
+    return SESSION_BACKENDS[backend]()
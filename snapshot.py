@@ -0,0 +1,245 @@
+# snapshot.py - IN-PROCESS COLUMNAR SNAPSHOT OF THE SEARCH DATA
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pandas.io.sql as pdsql
+
+#################################################
+# Snapshot Settings
+##################################################
+
+CONDITION_COLUMNS = ['Cancer', 'cardiovascular', 'stroke', 'depression', 'rehab',
+                     'vaccine', 'diarrhea', 'obesity', 'diabetes']
+MEASURES = [column.lower() for column in CONDITION_COLUMNS]
+TOTAL_MEASURE = 'searches'
+LOCATION_DIMENSIONS = ['location_id', 'city', 'state', 'postal', 'latitude', 'longitude']
+DIMENSIONS = LOCATION_DIMENSIONS + ['year']
+
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', '1') != '0'
+VERSION_CHECK_SECONDS = float(os.environ.get('SNAPSHOT_VERSION_CHECK_SECONDS', '30'))
+
+VERSION_SQL = """
+SELECT version, loaded_at
+FROM dataset_version
+ORDER BY version DESC
+LIMIT 1
+"""
+
+LOCATION_SQL = """
+SELECT location_id, city, state, postal, latitude, longitude
+FROM location
+"""
+
+SEARCH_SQL = """
+SELECT location_id, year, "Cancer", "cardiovascular", "stroke", "depression",
+       "rehab", "vaccine", "diarrhea", "obesity", "diabetes"
+FROM search_condition
+"""
+
+# Named aggregates mirroring the GROUP BY queries behind the legacy routes
+ROUTE_AGGREGATES = {
+    'searchbyyear': {
+        'dimensions': ['year'],
+        'measures': [TOTAL_MEASURE]
+    },
+    'searchyearandcondition': {
+        'dimensions': ['year'],
+        'measures': MEASURES
+    },
+    'searchbycity': {
+        'dimensions': ['city', 'postal', 'state', 'latitude', 'longitude'],
+        'measures': [TOTAL_MEASURE],
+        'order_by': [('city', True)]
+    },
+    'searchbystate': {
+        'dimensions': ['state', 'postal'],
+        'measures': [TOTAL_MEASURE]
+    },
+    'bystateandyear': {
+        'dimensions': ['state', 'latitude', 'longitude', 'year'],
+        'measures': [TOTAL_MEASURE],
+        'order_by': [('year', True)]
+    },
+    'mostsserached': {
+        'dimensions': ['state'],
+        'measures': MEASURES,
+        'order_by': [(measure, False) for measure in
+                     ['cancer', 'cardiovascular', 'stroke', 'depression', 'rehab',
+                      'vaccine', 'diarrhea', 'diabetes', 'obesity']],
+        'limit': 10
+    },
+    'totalcondition': {
+        'dimensions': [],
+        'measures': MEASURES
+    }
+}
+
+#################################################
+# Columnar Snapshot
+##################################################
+
+class DatasetSnapshot:
+    """Immutable NumPy copy of search_condition joined to location"""
+
+    def __init__(self, version, loaded_at, locations, location_codes, years, counts):
+        self.version = version
+        self.loaded_at = loaded_at
+        # One row per location; a row's position is its location code
+        self.locations = locations.reset_index(drop=True)
+        # Per search row: position in self.locations, or -1 when the join misses
+        self.location_codes = location_codes
+        self.years = years
+        self.counts = counts
+        self.total = np.sum([counts[m] for m in MEASURES], axis=0, dtype=np.int64)
+        self._dimension_cache = {}
+
+    @classmethod
+    def load(cls, engine, version=0, loaded_at=None):
+        """Read both tables once and convert them to typed arrays"""
+        locations = pdsql.read_sql(LOCATION_SQL, engine)
+        searches = pdsql.read_sql(SEARCH_SQL, engine)
+
+        locations['location_id'] = pd.to_numeric(locations['location_id'], errors='coerce')
+        locations['latitude'] = pd.to_numeric(locations['latitude'], errors='coerce')
+        locations['longitude'] = pd.to_numeric(locations['longitude'], errors='coerce')
+        locations = locations.drop_duplicates('location_id').reset_index(drop=True)
+
+        search_ids = pd.to_numeric(searches['location_id'], errors='coerce')
+        location_codes = pd.Index(locations['location_id']).get_indexer(search_ids)
+        years = pd.to_numeric(searches['year'], errors='coerce').fillna(0).to_numpy(np.int16)
+        counts = {
+            column.lower(): pd.to_numeric(searches[column], errors='coerce')
+                              .fillna(0).to_numpy(np.int32)
+            for column in CONDITION_COLUMNS
+        }
+
+        return cls(version, loaded_at, locations, location_codes.astype(np.int32), years, counts)
+
+    def __len__(self):
+        return len(self.years)
+
+    def _dimension(self, dimension):
+        """Per-row codes and sorted distinct values for a grouping dimension"""
+        if dimension not in self._dimension_cache:
+            if dimension == 'year':
+                values, codes = np.unique(self.years, return_inverse=True)
+            elif dimension in LOCATION_DIMENSIONS:
+                location_codes, values = pd.factorize(self.locations[dimension], sort=True,
+                                                      use_na_sentinel=False)
+                codes = np.where(self.location_codes >= 0,
+                                 location_codes[self.location_codes], -1)
+                values = np.asarray(values)
+            else:
+                raise ValueError(f"Unknown dimension: {dimension}")
+            self._dimension_cache[dimension] = (codes, values)
+        return self._dimension_cache[dimension]
+
+    def _measure(self, measure):
+        if measure == TOTAL_MEASURE:
+            return self.total
+        if measure not in self.counts:
+            raise ValueError(f"Unknown measure: {measure}")
+        return self.counts[measure]
+
+    def row_mask(self, dimensions=(), filters=None):
+        """Rows taking part in a query; location columns imply the inner join"""
+        filters = filters or {}
+        mask = np.ones(len(self), dtype=bool)
+        if any(d in LOCATION_DIMENSIONS for d in list(dimensions) + list(filters)):
+            mask &= self.location_codes >= 0
+        for dimension, value in filters.items():
+            codes, values = self._dimension(dimension)
+            if isinstance(value, dict):
+                # {'min': low, 'max': high}, either bound optional
+                wanted = np.ones(len(values), dtype=bool)
+                if 'min' in value:
+                    wanted &= values >= value['min']
+                if 'max' in value:
+                    wanted &= values <= value['max']
+            else:
+                wanted = value if isinstance(value, (list, tuple, set)) else [value]
+                wanted = np.isin(values, list(wanted))
+            mask &= np.isin(codes, np.flatnonzero(wanted))
+        return mask
+
+    def aggregate(self, dimensions, measures, filters=None, order_by=None, limit=None):
+        """SUM the measures grouped by the dimensions, like the route SQL does"""
+        mask = self.row_mask(dimensions, filters)
+
+        frame = {}
+        if dimensions:
+            codes = [self._dimension(d)[0][mask] for d in dimensions]
+            sizes = [max(len(self._dimension(d)[1]), 1) for d in dimensions]
+            keys, inverse = np.unique(np.ravel_multi_index(codes, sizes), return_inverse=True)
+            for dimension, part in zip(dimensions, np.unravel_index(keys, sizes)):
+                frame[dimension] = self._dimension(dimension)[1][part]
+            groups = len(keys)
+        else:
+            inverse = np.zeros(int(mask.sum()), dtype=np.intp)
+            groups = 1
+
+        for measure in measures:
+            sums = np.bincount(inverse, weights=self._measure(measure)[mask], minlength=groups)
+            frame[measure] = sums.astype(np.int64)
+
+        df = pd.DataFrame(frame, columns=list(dimensions) + list(measures))
+        if order_by:
+            df = df.sort_values([c for c, _ in order_by],
+                                ascending=[asc for _, asc in order_by], kind='mergesort')
+        if limit is not None:
+            df = df.head(limit)
+        return df.reset_index(drop=True)
+
+    def run(self, name):
+        """Answer one of the named legacy route aggregates"""
+        return self.aggregate(**ROUTE_AGGREGATES[name])
+
+#################################################
+# Per-Worker Snapshot Management
+##################################################
+
+_lock = threading.Lock()
+_snapshot = None
+_version = (0, None)
+_version_checked_at = 0.0
+
+def current_dataset_version(engine):
+    """Return (version, loaded_at), re-reading dataset_version at most every VERSION_CHECK_SECONDS"""
+    global _version, _version_checked_at
+    now = time.monotonic()
+    if _version_checked_at and now - _version_checked_at < VERSION_CHECK_SECONDS:
+        return _version
+    try:
+        df = pdsql.read_sql(VERSION_SQL, engine)
+        if len(df):
+            loaded_at = pd.Timestamp(df.iloc[0]['loaded_at']).to_pydatetime()
+            _version = (int(df.iloc[0]['version']), loaded_at)
+    except Exception as e:
+        print(f"Error in current_dataset_version: {e}")
+    _version_checked_at = now
+    return _version
+
+def get_snapshot(engine):
+    """Return this worker's snapshot, loading it on first use or after a version bump"""
+    global _snapshot
+    if not SNAPSHOT_ENABLED:
+        return None
+
+    version, loaded_at = current_dataset_version(engine)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            try:
+                started = time.perf_counter()
+                _snapshot = DatasetSnapshot.load(engine, version, loaded_at)
+                print(f"Loaded dataset snapshot v{version}: {len(_snapshot)} rows "
+                      f"in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"Error loading dataset snapshot: {e}")
+        return _snapshot
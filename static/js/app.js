@@ -116,11 +116,11 @@ class HealthDashboard {
 
         // Set up CSV download buttons
         document.querySelectorAll('.download-csv-btn').forEach(button => {
-            button.addEventListener('click', async (e) => {
+            button.addEventListener('click', (e) => {
                 const endpoint = e.target.dataset.endpoint;
                 const chartName = e.target.dataset.chartName || 'Health_Data';
                 if (endpoint) {
-                    await this.downloadCSV(endpoint, chartName);
+                    this.downloadCSV(endpoint, chartName);
                 }
             });
         });
@@ -1124,48 +1124,16 @@ class HealthDashboard {
         });
     }
 
-    async downloadCSV(endpoint, chartName) {
-        try {
-            const response = await fetch(endpoint);
-            const data = await response.json();
-
-            const cleanName = this.cleanFileName(chartName);
-            this.convertToCSVAndDownload(data.data, cleanName);
-        } catch (error) {
-            console.error('Error downloading CSV:', error);
-            alert('Error downloading CSV data. Please try again.');
-        }
-    }
-
-    convertToCSVAndDownload(data, filename) {
-        if (!data || data.length === 0) {
-            alert('No data available to download.');
-            return;
-        }
+    downloadCSV(endpoint, chartName) {
+        // The server streams the file, so large tables never sit in the page's memory
+        const [path, query] = endpoint.split('?');
+        const params = new URLSearchParams(query || '');
+        params.set('format', 'csv');
+        params.set('filename', this.cleanFileName(chartName));
 
-        const headers = Object.keys(data[0]);
-
-        let csvContent = headers.join(',') + '\n';
-
-        data.forEach(row => {
-            const values = headers.map(header => {
-                const value = row[header];
-                if (value === null || value === undefined) return '';
-                const stringValue = String(value);
-                if (stringValue.includes(',') || stringValue.includes('"') || stringValue.includes('\n')) {
-                    return '"' + stringValue.replace(/"/g, '""') + '"';
-                }
-                return stringValue;
-            });
-            csvContent += values.join(',') + '\n';
-        });
-
-        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
         const link = document.createElement('a');
-        const url = URL.createObjectURL(blob);
-
-        link.setAttribute('href', url);
-        link.setAttribute('download', `${filename}.csv`);
+        link.setAttribute('href', `/export${path}?${params}`);
+        link.setAttribute('download', '');
         link.style.visibility = 'hidden';
 
         document.body.appendChild(link);
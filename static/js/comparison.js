@@ -4,6 +4,7 @@ class ComparisonDashboard {
     constructor() {
         this.currentCity = 'Abilene-Sweetwater';
         this.statsData = null;
+        this.cityDataCache = {};
         this.cityList = [];
         this.cityCoordinates = {};
         this.isLoading = false;
@@ -453,11 +454,11 @@ class ComparisonDashboard {
 
         // Set up CSV download buttons (Matching app.js)
         document.querySelectorAll('.download-csv-btn').forEach(button => {
-            button.addEventListener('click', async (e) => {
+            button.addEventListener('click', (e) => {
                 const endpoint = e.target.dataset.endpoint;
                 const chartName = e.target.dataset.chartName || 'Comparison_Data';
                 if (endpoint) {
-                    await this.downloadCSV(endpoint, chartName);
+                    this.downloadCSV(endpoint, chartName);
                 }
             });
         });
@@ -534,20 +535,20 @@ class ComparisonDashboard {
         this.showLoadingState();
 
         try {
-            const response = await fetch('/allsearchrecord');
+            // Only the city names are needed up front; each city's rows are fetched on selection
+            const response = await fetch('/location?fields=city');
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             const rows = await response.json();
-            this.statsData = rows.data;
-            console.log(`Data loaded: ${this.statsData.length} records`);
+            console.log(`Cities loaded: ${rows.data.length} records`);
 
-            this.processData();
+            this.processData(rows.data);
             this.setupCitySelector();
 
             // Force load Austin data
             console.log(`Setting initial chart for: ${this.currentCity}`);
-            this.setBarPlot(this.currentCity);
+            await this.setBarPlot(this.currentCity);
 
         } catch (error) {
             console.error('Error loading data:', error);
@@ -603,9 +604,9 @@ class ComparisonDashboard {
         }
     }
 
-    processData() {
-        if (!this.statsData) return;
-        const cities = [...new Set(this.statsData.map(row => row.city))].sort();
+    processData(rows = this.statsData) {
+        if (!rows) return;
+        const cities = [...new Set(rows.map(row => row.city))].sort();
         this.cityList = cities.filter(city => city && city.trim() !== '');
         console.log(`Processed ${this.cityList.length} cities:`, this.cityList.slice(0, 5));
     }
@@ -629,15 +630,43 @@ class ComparisonDashboard {
         }
     }
 
-    setBarPlot(chosenCity) {
+    async getCityData(city) {
+        // Placeholder rows are kept locally when the API is unavailable
+        if (this.statsData) {
+            return this.statsData.filter(row => row.city === city);
+        }
+
+        if (!this.cityDataCache[city]) {
+            const params = new URLSearchParams({
+                city: city,
+                fields: 'city,state,postal,Cancer,cardiovascular,stroke,depression,rehab,vaccine,diarrhea,obesity,diabetes'
+            });
+            const response = await fetch(`/allsearchrecord?${params}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const rows = await response.json();
+            this.cityDataCache[city] = rows.data;
+        }
+        return this.cityDataCache[city];
+    }
+
+    async setBarPlot(chosenCity) {
         console.log(`Setting bar plot for city: ${chosenCity}`);
 
-        if (!this.statsData || !chosenCity) {
+        if (!chosenCity) {
             console.error('No data or city selected');
             return;
         }
 
-        const cityData = this.statsData.filter(row => row.city === chosenCity);
+        let cityData;
+        try {
+            cityData = [...await this.getCityData(chosenCity)];
+        } catch (error) {
+            console.error('Error loading city data:', error);
+            this.showErrorMessage(`Failed to load data for ${chosenCity}`);
+            return;
+        }
         console.log(`Found ${cityData.length} records for ${chosenCity}`);
 
         if (cityData.length === 0) {
@@ -1432,48 +1461,16 @@ updateScatterPlots(cityData, years, cityName) {
         }
     }
 
-    async downloadCSV(endpoint, chartName) {
-        try {
-            const response = await fetch(endpoint);
-            const data = await response.json();
-
-            const cleanName = this.cleanFileName(chartName);
-            this.convertToCSVAndDownload(data.data, cleanName);
-        } catch (error) {
-            console.error('Error downloading CSV:', error);
-            alert('Error downloading CSV data. Please try again.');
-        }
-    }
-
-    convertToCSVAndDownload(data, filename) {
-        if (!data || data.length === 0) {
-            alert('No data available to download.');
-            return;
-        }
+    downloadCSV(endpoint, chartName) {
+        // The server streams the file, so large tables never sit in the page's memory
+        const [path, query] = endpoint.split('?');
+        const params = new URLSearchParams(query || '');
+        params.set('format', 'csv');
+        params.set('filename', this.cleanFileName(chartName));
 
-        const headers = Object.keys(data[0]);
-
-        let csvContent = headers.join(',') + '\n';
-
-        data.forEach(row => {
-            const values = headers.map(header => {
-                const value = row[header];
-                if (value === null || value === undefined) return '';
-                const stringValue = String(value);
-                if (stringValue.includes(',') || stringValue.includes('"') || stringValue.includes('\n')) {
-                    return '"' + stringValue.replace(/"/g, '""') + '"';
-                }
-                return stringValue;
-            });
-            csvContent += values.join(',') + '\n';
-        });
-
-        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
         const link = document.createElement('a');
-        const url = URL.createObjectURL(blob);
-
-        link.setAttribute('href', url);
-        link.setAttribute('download', `${filename}.csv`);
+        link.setAttribute('href', `/export${path}?${params}`);
+        link.setAttribute('download', '');
         link.style.visibility = 'hidden';
 
         document.body.appendChild(link);
@@ -890,20 +890,12 @@ class UltraHealthAnalyticsChatbot {
 
         try {
             // Send to backend with context
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    question: question,
-                    session_id: this.sessionId,
-                    context: this.conversationContext.slice(-5) // Last 5 messages
-                })
+            const data = await this.requestAnswer({
+                question: question,
+                session_id: this.sessionId,
+                context: this.conversationContext.slice(-5) // Last 5 messages
             });
 
-            const data = await response.json();
-
             // Remove typing indicator
             this.removeTyping();
 
@@ -943,6 +935,83 @@ class UltraHealthAnalyticsChatbot {
         }
     }
 
+    async requestAnswer(payload) {
+        // Stream the answer when the browser can read the response body as it arrives
+        const canStream = typeof ReadableStream !== 'undefined' && typeof TextDecoder !== 'undefined';
+        const response = await fetch('/api/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': canStream ? 'text/event-stream' : 'application/json'
+            },
+            body: JSON.stringify({ ...payload, stream: canStream })
+        });
+
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!response.body || !contentType.includes('text/event-stream')) {
+            return response.json();
+        }
+        return this.readEventStream(response);
+    }
+
+    async readEventStream(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = { success: false };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (!data) continue;
+
+                const eventData = JSON.parse(data);
+                if (event === 'done' || event === 'error') {
+                    result = eventData;
+                } else {
+                    this.updateTyping(event, eventData);
+                }
+            }
+        }
+        return result;
+    }
+
+    updateTyping(event, eventData) {
+        const indicator = document.getElementById('typing-indicator');
+        if (!indicator) return;
+
+        if (event === 'meta') {
+            indicator.querySelector('.typing-indicator span').textContent =
+                `Looking up ${eventData.title.toLowerCase()}...`;
+        } else if (event === 'progress') {
+            const bar = indicator.querySelector('.progress-bar');
+            bar.style.animation = 'none';
+            bar.style.width = `${Math.round(100 * eventData.done / eventData.total)}%`;
+        } else if (event === 'section') {
+            let preview = indicator.querySelector('.stream-preview');
+            if (!preview) {
+                preview = document.createElement('div');
+                preview.className = 'stream-preview';
+                indicator.querySelector('.message-content').appendChild(preview);
+            }
+            preview.insertAdjacentHTML('beforeend', this.formatMessageContent(`${eventData.text}\n\n`, 'bot'));
+        }
+        this.body.scrollTop = this.body.scrollHeight;
+    }
+
     addEnhancedMessage(content, sender) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `chat-message ${sender}-message`;
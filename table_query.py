@@ -0,0 +1,198 @@
+# table_query.py - projection, filters and keyset pagination for the table routes
+import base64
+import json
+
+CONDITION_COLUMNS = ['Cancer', 'cardiovascular', 'stroke', 'depression', 'rehab',
+                     'vaccine', 'diarrhea', 'obesity', 'diabetes']
+
+CAUSE_OF_DEATH_COLUMNS = ['Diseases_of_heart', 'Malignant_neoplasms', 'Accidents', 'Respiratory',
+                          'Cerebrovascular', 'Alzheimer', 'Diabetes', 'Influenza_and_pneumonia',
+                          'Nephrosis', 'Suicide']
+
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+# For each table route: the FROM clause, the columns a client may project
+# (name -> SQL expression), the DataFrame index, the keyset used for stable
+# ordering and cursors, and the supported filters (name -> predicate).
+TABLE_ROUTES = {
+    'allsearchrecord': {
+        'source': 'location l INNER JOIN search_condition s ON s.location_id = l.location_id',
+        'columns': dict(
+            [('location_id', 's.location_id'), ('city', 'l.city'), ('state', 'l.state'),
+             ('postal', 'l.postal'), ('latitude', 'l.latitude'), ('longitude', 'l.longitude')] +
+            [(c, f's."{c}"') for c in CONDITION_COLUMNS] +
+            [('year', 's.year')]
+        ),
+        'index': 'year',
+        'keyset': ['year', 'location_id'],
+        'filters': {
+            'city': 'l.city = :city',
+            'state': 'l.state = :state',
+            'year_from': 's.year >= :year_from',
+            'year_to': 's.year <= :year_to'
+        }
+    },
+    'conditions': {
+        'source': 'search_condition s',
+        'columns': dict(
+            [('location_id', 's.location_id')] +
+            [(c, f's."{c}"') for c in CONDITION_COLUMNS] +
+            [('year', 's.year')]
+        ),
+        'index': 'location_id',
+        'keyset': ['year', 'location_id'],
+        'filters': {
+            'city': 's.location_id IN (SELECT location_id FROM location WHERE city = :city)',
+            'state': 's.location_id IN (SELECT location_id FROM location WHERE state = :state)',
+            'year_from': 's.year >= :year_from',
+            'year_to': 's.year <= :year_to'
+        }
+    },
+    'location': {
+        'source': 'location l',
+        'columns': {
+            'location_id': 'l.location_id',
+            'city': 'l.city',
+            'state': 'l.state',
+            'postal': 'l.postal',
+            'latitude': 'l.latitude',
+            'longitude': 'l.longitude'
+        },
+        'index': 'location_id',
+        'keyset': ['location_id'],
+        'filters': {
+            'city': 'l.city = :city',
+            'state': 'l.state = :state'
+        }
+    },
+    'casesleadingdeath': {
+        'source': 'leading_causes_of_death d',
+        'columns': dict(
+            [(c, f'd."{c}"') for c in CAUSE_OF_DEATH_COLUMNS] +
+            [('year', 'd.year')]
+        ),
+        'index': 'year',
+        'keyset': ['year'],
+        'filters': {
+            'year_from': 'd.year >= :year_from',
+            'year_to': 'd.year <= :year_to'
+        }
+    }
+}
+
+INTEGER_FILTERS = {'year_from', 'year_to'}
+
+
+class QueryParamError(ValueError):
+    """Raised for an invalid query string on a table route"""
+
+
+def encode_cursor(values):
+    """Opaque cursor for the keyset values of the last row on a page"""
+    raw = json.dumps([int(v) for v in values]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if (not isinstance(values, list) or len(values) != size or
+                not all(isinstance(v, int) and not isinstance(v, bool) for v in values)):
+            raise ValueError(cursor)
+        return values
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise QueryParamError(f"Invalid cursor: {cursor}")
+
+
+def is_table_query(name, args):
+    """True when args holds any parameter the table route understands
+
+    Other parameters, such as a cache-busting ?_=123, keep the full legacy payload.
+    """
+    keys = ['fields', 'limit', 'cursor'] + list(TABLE_ROUTES[name]['filters'])
+    return any(args.get(key) for key in keys)
+
+
+def parse_table_query(name, args):
+    """Validate fields, filters, limit and cursor from a request's query string"""
+    route = TABLE_ROUTES[name]
+    query = {'fields': None, 'filters': {}, 'limit': None, 'cursor': None}
+
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in route['columns']]
+        if unknown:
+            raise QueryParamError(f"Unknown fields: {', '.join(unknown)}. "
+                                  f"Available: {', '.join(route['columns'])}")
+        query['fields'] = fields
+
+    for key in route['filters']:
+        value = args.get(key)
+        if value in (None, ''):
+            continue
+        if key in INTEGER_FILTERS:
+            try:
+                value = int(value)
+            except ValueError:
+                raise QueryParamError(f"{key} must be an integer")
+        query['filters'][key] = value
+
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise QueryParamError("limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise QueryParamError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        query['limit'] = limit
+
+    if args.get('cursor'):
+        query['cursor'] = decode_cursor(args['cursor'], len(route['keyset']))
+        query['limit'] = query['limit'] or PAGE_SIZE
+
+    return query
+
+
+def build_table_query(name, fields=None, filters=None, limit=None, cursor=None):
+    """Parameterized SELECT for a table route, ordered by its keyset
+
+    Returns (sql, params). The index and keyset columns are always selected
+    so the caller can build the next cursor.
+    """
+    route = TABLE_ROUTES[name]
+    columns = route['columns']
+    filters = filters or {}
+
+    selected = list(fields) if fields else list(columns)
+    for column in [route['index']] + route['keyset']:
+        if column not in selected:
+            selected.append(column)
+
+    select = ', '.join(f'{columns[c]} AS "{c}"' for c in selected)
+    where = [route['filters'][key] for key in filters]
+    params = dict(filters)
+
+    keyset = [columns[c] for c in route['keyset']]
+    if cursor is not None:
+        placeholders = [f':cursor_{i}' for i in range(len(keyset))]
+        where.append(f"({', '.join(keyset)}) > ({', '.join(placeholders)})")
+        params.update({f'cursor_{i}': v for i, v in enumerate(cursor)})
+
+    sql = f"SELECT {select}\nFROM {route['source']}"
+    if where:
+        sql += "\nWHERE " + "\n  AND ".join(where)
+    sql += f"\nORDER BY {', '.join(keyset)}"
+    if limit is not None:
+        sql += "\nLIMIT :limit"
+        params['limit'] = limit
+    return sql, params
+
+
+def next_cursor(name, df, limit):
+    """Cursor for the page after df, or None when df was the last page"""
+    if limit is None or len(df) < limit:
+        return None
+    last = df.iloc[-1]
+    return encode_cursor([last[c] for c in TABLE_ROUTES[name]['keyset']])
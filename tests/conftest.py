@@ -0,0 +1,33 @@
+# conftest.py - shared fixtures: the real location list and a chatbot on a SQLite copy of the CSVs
+import contextlib
+import csv
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LOAD_DIR = os.path.join(ROOT, 'Data', 'database', 'load_in_to_db')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+@pytest.fixture(scope='session')
+def locations():
+    """(city, state, location_id) for every row of location.csv"""
+    with open(os.path.join(LOAD_DIR, 'location.csv'), newline='', encoding='utf-8-sig') as f:
+        return [(row['city'], row['state'], int(row['location_id'])) for row in csv.DictReader(f)]
+
+
+@pytest.fixture(scope='session')
+def chatbot(tmp_path_factory):
+    """The app's chatbot, with DATABASE_URL pointing at a fixture database"""
+    from chatbot_benchmark import build_fixture
+
+    path = str(tmp_path_factory.mktemp('db') / 'health.sqlite3')
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_fixture(path)
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+        import app
+    return app.enhanced_chatbot
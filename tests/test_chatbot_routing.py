@@ -0,0 +1,39 @@
+def test_part_of_a_combined_name_answers_for_that_area(chatbot):
+    response = chatbot.get_response("Show me data for Sweetwater")
+    assert response['metadata']['response_type'] == 'city_analysis'
+    assert response['entities']['city'] == 'Abilene-Sweetwater'
+    assert response['data_summary']['city_data_points'] == 14
+
+
+def test_shared_city_name_asks_which_area(chatbot):
+    response = chatbot.get_response("Tell me about Columbus")
+    assert response['metadata']['response_type'] == 'city_analysis'
+    assert 'Columbus, Georgia' in response['response']
+    assert 'Columbus, Ohio' in response['response']
+    assert 'city_data_points' not in response['data_summary']
+
+
+def test_city_with_its_state_answers_for_one_area(chatbot):
+    response = chatbot.get_response("Tell me about Columbus, Ohio")
+    assert response['metadata']['response_type'] == 'city_analysis'
+    assert 'State: **Ohio**' in response['response']
+    assert 'Georgia' not in response['response']
+
+
+def route(chatbot, question):
+    return chatbot._determine_response_type(question, chatbot._extract_entities(question))[0]
+
+
+def test_link_alone_does_not_ask_for_correlations(chatbot):
+    assert route(chatbot, "send me the link to the project") == 'project_overview'
+    assert route(chatbot, "How are the team members connected?") == 'team_members'
+
+
+def test_correlation_words_next_to_a_condition(chatbot):
+    assert route(chatbot, "How is diabetes linked to obesity?") == 'correlation_analysis'
+    assert route(chatbot, "Show diabetes correlations in California") == 'correlation_analysis'
+
+
+def test_correlation_as_the_best_keyword_match(chatbot):
+    assert route(chatbot, "Show correlations in 2017") == 'correlation_analysis'
+    assert route(chatbot, "Explain correlation analysis") == 'correlation_analysis'
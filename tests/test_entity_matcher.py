@@ -0,0 +1,62 @@
+import pytest
+
+from entity_matcher import EntityMatcher
+
+
+@pytest.fixture(scope='module')
+def matcher(locations):
+    return EntityMatcher(locations)
+
+
+@pytest.mark.parametrize('question, city', [
+    ("Show me data for Sweetwater", 'Abilene-Sweetwater'),
+    ("Tell me about Dallas", 'Dallas-Ft. Worth'),
+    ("Tell me about Seattle", 'Seattle-Tacoma'),
+    ("How about Iowa City?", 'Cedar Rapids-Waterloo-Iowa City & Dubuque'),
+])
+def test_part_of_a_combined_name_finds_the_area(matcher, question, city):
+    assert matcher.extract(question)['city'] == city
+    assert len(matcher.cities.resolve(city)) == 1
+
+
+def test_shared_name_resolves_to_every_area(matcher):
+    assert matcher.extract("Tell me about Columbus")['city'] == 'Columbus'
+    assert matcher.cities.resolve('Columbus') == [522, 535]
+
+
+@pytest.mark.parametrize('question, city, location_id', [
+    ("Tell me about Columbus, Ohio", 'Columbus, Ohio', 535),
+    ("Tell me about Columbus Georgia", 'Columbus, Georgia', 522),
+    ("Rochester, Minnesota searches", 'Rochester, Minnesota', 611),
+])
+def test_state_picks_one_of_a_shared_name(matcher, question, city, location_id):
+    entities = matcher.extract(question)
+    assert entities['city'] == city
+    assert entities['state'] is None
+    assert matcher.cities.resolve(city) == [location_id]
+
+
+def test_ordinary_words_in_names_are_not_cities(matcher):
+    assert matcher.extract("Which cities search the most?")['city'] is None
+
+
+@pytest.mark.parametrize('question, kind, value', [
+    ("Tell me about diabtes", 'condition', 'diabetes'),
+    ("Show me califronia searches", 'state', 'California'),
+    ("What about north carolna?", 'state', 'North Carolina'),
+])
+def test_misspellings_are_corrected(matcher, question, kind, value):
+    assert matcher.extract(question)[kind] == value
+
+
+@pytest.mark.parametrize('question', [
+    "Tell me about the marine corps",
+    "What do indian health searches look like?",
+    "Did you use regression?",
+    "Read the texts you heard",
+])
+def test_english_words_are_not_corrected_into_entities(matcher, question):
+    entities = matcher.extract(question)
+    assert entities['state'] is None
+    assert entities['condition'] is None
+    assert entities['city'] is None
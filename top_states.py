@@ -0,0 +1,85 @@
+# top_states.py - PRECOMPUTED TOP STATES PER CONDITION
+import os
+import threading
+
+import numpy as np
+
+from olap_query import QUERY_MEASURES, run_olap_query
+from snapshot import current_dataset_version
+
+TOP_STATES_K = int(os.environ.get('TOP_STATES_K', '10'))
+
+# Every measure summed per state and year, in one aggregation
+STATE_YEAR_QUERY = {
+    'dimensions': ['state', 'year'],
+    'measures': QUERY_MEASURES,
+    'filters': {},
+    'order_by': [],
+    'limit': None
+}
+
+#################################################
+# Ranked States
+##################################################
+
+def rank_states(totals, k):
+    """measure -> the k states with the most searches, ties broken by state name
+
+    totals is a DataFrame indexed by state with one column per measure;
+    every measure is ranked by the same stable argsort.
+    """
+    totals = totals.sort_index()
+    states = totals.index.to_numpy(object)
+    values = totals.to_numpy(np.int64)
+    order = np.argsort(-values, axis=0, kind='stable')[:k]
+    return {
+        measure: [{'state': states[i], 'search_volume': int(values[i, j])} for i in order[:, j]]
+        for j, measure in enumerate(totals.columns)
+    }
+
+
+class TopStates:
+    """Top k states for every condition, overall and per year, for one dataset version
+
+    Built from a single state-by-year aggregate, so answering "top states
+    for X" afterwards only copies k entries.
+    """
+
+    def __init__(self, state_years, version=None, k=TOP_STATES_K):
+        self.version = version
+        self.k = k
+        measures = [m for m in QUERY_MEASURES if m in state_years]
+        self.overall = rank_states(state_years.groupby('state')[measures].sum(), k)
+        self.by_year = {
+            int(year): rank_states(group.groupby('state')[measures].sum(), k)
+            for year, group in state_years.groupby('year')
+        }
+
+    def top(self, condition, year=None, k=None):
+        """Up to k {'state', 'search_volume'} records, most searched first"""
+        ranked = self.overall if year is None else self.by_year.get(int(year), {})
+        return list(ranked.get(condition.lower(), [])[:k or self.k])
+
+#################################################
+# Per-Worker Top States Management
+##################################################
+
+_lock = threading.Lock()
+_top_states = None
+
+def get_top_states(engine):
+    """Return this worker's top states, rebuilding them when the dataset version changes"""
+    global _top_states
+    version, _ = current_dataset_version(engine)
+    top_states = _top_states
+    if top_states is not None and top_states.version == version:
+        return top_states
+
+    with _lock:
+        if _top_states is None or _top_states.version != version:
+            try:
+                _, state_years = run_olap_query(engine, STATE_YEAR_QUERY)
+                _top_states = TopStates(state_years, version)
+            except Exception as e:
+                print(f"Error ranking top states: {e}")
+        return _top_states